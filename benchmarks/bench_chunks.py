@@ -0,0 +1,74 @@
+"""Chunked framing: a sync of N creates through the command input entity.
+
+    python benchmarks/bench_chunks.py [--sizes 100 1000 5000]
+
+Compares sending each create as its own state of the input entity with sending
+all of them as one batch in frames (framing.py), plain and zlib + base64.
+Reported per mode: state writes of the input entity, frame characters sent and
+the time until every entity's state exists. Runs on the fakes in fake_hass.py.
+One message is limited to MAX_CHUNKS frames (about 10000 creates in plain text).
+"""
+import argparse
+import asyncio
+import json
+import logging
+import time
+
+import fake_hass
+from bench_storm import create_command, integration
+
+
+async def run_mode(size: int, mode: str) -> dict:
+    fake_hass.FakeStore.reset()
+    hass, entry = await fake_hass.async_setup()
+    processor = hass.data[integration("const").DOMAIN][entry.entry_id]
+    framing = integration("framing")
+    full_entity_id = integration("entity_table").full_entity_id
+    input_entity = f"text.{integration('const').ENTITY_ID_COMMAND}"
+
+    creates = [create_command(i) for i in range(size)]
+    expected = [full_entity_id(c["type"], c["entityID"]) for c in creates]
+    if mode == "single":
+        payloads = [json.dumps(c) for c in creates]
+    else:
+        encoding = framing.ENCODING_ZLIB if mode == "zlib" else framing.ENCODING_PLAIN
+        payloads = framing.encode_chunks(json.dumps({"command": "batch", "items": creates}), "sync", encoding)
+
+    started = time.perf_counter()
+    for payload in payloads:
+        hass.states.async_set(input_entity, payload)
+        await asyncio.sleep(0)
+    while processor.queue.depth or any(hass.states.get(entity_id) is None for entity_id in expected):
+        if time.perf_counter() - started > 600:
+            raise TimeoutError(f"{mode}: entities never appeared")
+        await asyncio.sleep(0.001)
+    elapsed = time.perf_counter() - started
+
+    await fake_hass.async_unload(hass, entry)
+    return {
+        "mode": mode,
+        "writes": len(payloads),
+        "chars": sum(map(len, payloads)),
+        "seconds": elapsed,
+        "errors": sum(processor.metrics.errors.values()),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000])
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    print(f"{'size':>6} {'mode':<7} {'writes':>7} {'chars':>10} {'seconds':>8} {'errors':>6}")
+    for size in args.sizes:
+        for mode in ("single", "plain", "zlib"):
+            row = asyncio.run(run_mode(size, mode))
+            print(
+                f"{size:>6} {row['mode']:<7} {row['writes']:>7} {row['chars']:>10,} "
+                f"{row['seconds']:>8.3f} {row['errors']:>6}"
+            )
+
+
+if __name__ == "__main__":
+    main()
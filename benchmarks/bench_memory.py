@@ -0,0 +1,125 @@
+"""Memory benchmark: the entity table and restore commands for N entities.
+
+    python benchmarks/bench_memory.py [--entities N]
+
+Compares the previous representation (one dict per stored entity, plain
+@dataclass Command) with EntityRecord and the slotted, frozen Command, using
+tracemalloc. Only command.py, const.py, metrics.py and entity_table.py are
+loaded, Home Assistant is not needed.
+"""
+import argparse
+import gc
+import importlib
+import sys
+import tracemalloc
+import types
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional
+
+PACKAGE = "custom_components.hs_command_listener"
+PACKAGE_DIR = Path(__file__).resolve().parent.parent / "custom_components" / "hs_command_listener"
+
+
+def load_module(name: str):
+    # register the package without running its __init__ (which imports homeassistant)
+    for pkg, path in (("custom_components", PACKAGE_DIR.parent), (PACKAGE, PACKAGE_DIR)):
+        if pkg not in sys.modules:
+            module = types.ModuleType(pkg)
+            module.__path__ = [str(path)]
+            sys.modules[pkg] = module
+    return importlib.import_module(f"{PACKAGE}.{name}")
+
+
+@dataclass
+class OldCommand:
+    """Field-for-field copy of Command before it was slotted."""
+
+    command: str
+    type: Optional[str] = None
+    entityID: Optional[str] = None
+    name: Optional[str] = None
+    force: bool = True
+    min: float = None
+    max: float = None
+    step: Optional[float] = None
+    selects: Optional[List[str]] = None
+    pattern: Optional[str] = None
+
+
+def stored_records(count: int) -> List[dict]:
+    """A realistic mix of HomeSeer devices, as EntityStore loads them."""
+    records = []
+    for i in range(count):
+        kind = i % 10
+        if kind < 6:
+            records.append({"type": "TOGGLE", "entityID": f"homeseer_{i}", "name": f"Device {i}"})
+        elif kind < 8:
+            records.append({
+                "type": "NUMBER", "entityID": f"homeseer_{i}", "name": f"Setpoint {i}",
+                "min": 5, "max": 35, "step": 0.5,
+            })
+        elif kind < 9:
+            records.append({
+                "type": "SELECT", "entityID": f"homeseer_{i}", "name": f"Scene {i}",
+                "selects": ["Off", "Low", "Medium", "High"],
+            })
+        else:
+            records.append({"type": "TEXT", "entityID": f"homeseer_{i}", "name": f"Label {i}"})
+    return records
+
+
+def measure(label: str, build) -> int:
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  {label:<40} {current / 1024:>10,.0f} KiB  (peak {peak / 1024:,.0f} KiB)")
+    del result
+    return current
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entities", type=int, default=10000)
+    args = parser.parse_args()
+
+    entity_table = load_module("entity_table")
+    Command = load_module("command").Command
+    EntityRecord = entity_table.EntityRecord
+
+    def old_table():
+        # previous EntityTable: the stored dicts themselves, in three indexes
+        by_key, by_unique_id, by_entity_id = {}, {}, {}
+        for record in stored_records(args.entities):
+            etype, entity_id = record["type"], record["entityID"]
+            by_key[entity_key(etype, entity_id)] = record
+            by_unique_id[unique_id_for(etype, entity_id)] = record
+            by_entity_id[full_entity_id(etype, entity_id)] = record
+        return by_key, by_unique_id, by_entity_id
+
+    entity_key = entity_table.entity_key
+    unique_id_for = entity_table.unique_id_for
+    full_entity_id = entity_table.full_entity_id
+
+    print(f"{args.entities:,} stored entities")
+    old = measure("entity table, dict records", old_table)
+    new = measure("entity table, EntityRecord", lambda: entity_table.EntityTable(stored_records(args.entities)))
+    print(f"  {'saved':<40} {(old - new) / 1024:>10,.0f} KiB ({1 - new / old:.0%})")
+
+    records = [EntityRecord.from_dict(record) for record in stored_records(args.entities)]
+    print(f"{args.entities:,} restore commands")
+    old = measure("@dataclass Command", lambda: [
+        OldCommand(command="create", type=r.type, entityID=r.entityID, name=r.name, force=False,
+                   min=r.min, max=r.max, step=r.step,
+                   selects=list(r.selects) if r.selects is not None else None, pattern=r.pattern)
+        for r in records
+    ])
+    new = measure("slotted, frozen Command", lambda: [entity_table.command_from_record(r) for r in records])
+    print(f"  {'saved':<40} {(old - new) / 1024:>10,.0f} KiB ({1 - new / old:.0%})")
+    assert isinstance(entity_table.command_from_record(records[0]), Command)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Microbenchmark: command parsing throughput on realistic HomeSeer payloads.
+
+    python benchmarks/bench_parse.py [--number N]
+
+Compares the old path (replace + json.loads + Command(**data), no validation)
+with Command.from_json (schema validation) using orjson and the stdlib json.
+Only command.py, const.py and metrics.py are loaded, Home Assistant is not needed.
+
+Validation is not free: from_json is slower than the old path, by about 40% with
+the stdlib json (create NUMBER: 11.5 us vs 8.0 us) and 5-10% with orjson (8.4 us),
+the decoder Home Assistant installs. Most of a command's time is the JSON decode and
+the frozen Command constructor, which the old path pays too; the per-key type check
+costs 1-2 us. An all-C fast path (checking (key, type) pairs against a precomputed
+set) measured no better than the loop and was not kept.
+"""
+import argparse
+import importlib
+import json
+import sys
+import timeit
+import types
+from pathlib import Path
+
+PACKAGE = "custom_components.hs_command_listener"
+PACKAGE_DIR = Path(__file__).resolve().parent.parent / "custom_components" / "hs_command_listener"
+
+
+def load_command_module():
+    # register the package without running its __init__ (which imports homeassistant)
+    for name, path in (("custom_components", PACKAGE_DIR.parent), (PACKAGE, PACKAGE_DIR)):
+        if name not in sys.modules:
+            module = types.ModuleType(name)
+            module.__path__ = [str(path)]
+            sys.modules[name] = module
+    return importlib.import_module(f"{PACKAGE}.command")
+
+
+PAYLOADS = {
+    "create TOGGLE": {"command": "create", "type": "TOGGLE", "entityID": "homeseer_713", "name": "Kitchen Light"},
+    "create NUMBER": {
+        "command": "create", "type": "NUMBER", "entityID": "homeseer_1021",
+        "name": "Thermostat Setpoint", "min": 5, "max": 35, "step": 0.5,
+    },
+    "create SELECT": {
+        "command": "create", "type": "SELECT", "entityID": "homeseer_2048", "name": "Scene",
+        "selects": [f"Scene {i}" for i in range(20)],
+    },
+    "delete": {"command": "delete", "type": "TOGGLE", "entityID": "homeseer_713"},
+}
+
+
+def bench(label: str, func, number: int) -> None:
+    seconds = min(timeit.repeat(func, number=number, repeat=5))
+    print(f"  {label:<28} {number / seconds:>12,.0f} /s {seconds / number * 1e6:>9.2f} us")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", type=int, default=20000)
+    args = parser.parse_args()
+
+    command = load_command_module()
+    Command = command.Command
+    orjson_loads = command._json_loads
+    has_orjson = orjson_loads is not json.loads
+
+    def old_from_json(raw: str):
+        clean = raw.replace("\r", "").replace("\n", "")
+        return Command(**json.loads(clean))
+
+    payloads = {name: json.dumps(data) for name, data in PAYLOADS.items()}
+    payloads["create NUMBER (pretty)"] = json.dumps(PAYLOADS["create NUMBER"], indent=2)
+
+    for name, raw in payloads.items():
+        print(name)
+        bench("old: json + Command(**)", lambda: old_from_json(raw), args.number)
+        command._json_loads = json.loads
+        bench("from_json, json", lambda: Command.from_json(raw), args.number)
+        if has_orjson:
+            command._json_loads = orjson_loads
+            bench("from_json, orjson", lambda: Command.from_json(raw), args.number)
+
+    batch = json.dumps([PAYLOADS["create NUMBER"]] * 500)
+    print("batch of 500 (load + validate)")
+    loaders = [("json", json.loads)] + ([("orjson", orjson_loads)] if has_orjson else [])
+    for label, loads in loaders:
+        command._json_loads = loads
+        bench(
+            f"from_dict, {label}",
+            lambda: [Command.from_dict(item) for item in command.load_json(batch)],
+            max(1, args.number // 500),
+        )
+    command._json_loads = orjson_loads
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""Load test: HomeSeer sync storms against a fake Home Assistant.
+
+    python benchmarks/bench_storm.py [--sizes 100 1000 10000] [--no-memory]
+                                     [--option coalesce_window=0 ...]
+
+The integration is set up through its own async_setup_entry on the fakes in
+fake_hass.py (CommandProcessor, EntityStore, the five entity platforms and the
+command input text entity). Each size runs three phases, one command per state
+change of the input entity, as HomeSeer sends them:
+
+  create  N creates (60% TOGGLE, 20% NUMBER, 10% SELECT, 10% TEXT)
+  delete  N / 2 deletes
+  purge   one purge of everything left
+
+A phase ends when the queue is drained and every entity's state has appeared
+(or disappeared). Reported per phase: throughput, end-to-end latency
+percentiles in ms (input state set -> entity state written/removed), the
+processor's own STAGE_TOTAL p95, peak traced memory, and the snapshot store
+writes and journal writes (fsync batches) once the delayed writes have settled.
+tracemalloc costs throughput; --no-memory skips it.
+"""
+import argparse
+import asyncio
+import gc
+import importlib
+import json
+import logging
+import time
+import tracemalloc
+from typing import Dict, List
+
+import fake_hass
+
+
+def integration(module: str):
+    return importlib.import_module(f"{fake_hass.PACKAGE}.{module}")
+
+
+def create_command(i: int) -> dict:
+    kind = i % 10
+    if kind < 6:
+        return {"command": "create", "type": "TOGGLE", "entityID": f"hs_{i}", "name": f"Device {i}"}
+    if kind < 8:
+        return {"command": "create", "type": "NUMBER", "entityID": f"hs_{i}", "name": f"Setpoint {i}",
+                "min": 5, "max": 35, "step": 0.5}
+    if kind < 9:
+        return {"command": "create", "type": "SELECT", "entityID": f"hs_{i}", "name": f"Scene {i}",
+                "selects": ["Off", "Low", "Medium", "High"]}
+    return {"command": "create", "type": "TEXT", "entityID": f"hs_{i}", "name": f"Label {i}"}
+
+
+class StateWatcher:
+    """Time when watched entity states appear or disappear in the fake state machine."""
+
+    def __init__(self, hass) -> None:
+        self.hass = hass
+        self.sent: Dict[str, float] = {}
+        self.latencies: List[float] = []
+        self.appear = True
+        states = hass.states
+        self._set, self._remove = states.async_set, states.async_remove
+        states.async_set, states.async_remove = self._on_set, self._on_remove
+
+    def watch(self, entity_ids, appear: bool) -> None:
+        now = time.perf_counter()
+        self.appear = appear
+        for entity_id in entity_ids:
+            self.sent[entity_id] = now
+
+    def _seen(self, entity_id: str) -> None:
+        sent = self.sent.pop(entity_id, None)
+        if sent is not None:
+            self.latencies.append(time.perf_counter() - sent)
+
+    def _on_set(self, entity_id, new_state, attributes=None):
+        self._set(entity_id, new_state, attributes)
+        if self.appear:
+            self._seen(entity_id)
+
+    def _on_remove(self, entity_id):
+        removed = self._remove(entity_id)
+        if removed and not self.appear:
+            self._seen(entity_id)
+        return removed
+
+
+def percentile(samples: List[float], q: float) -> float:
+    return samples[min(len(samples) - 1, int(q * len(samples)))] * 1000
+
+
+async def run_phase(hass, processor, watcher: StateWatcher, name: str, commands, watched, appear, memory):
+    input_entity = f"text.{integration('const').ENTITY_ID_COMMAND}"
+    processor.metrics.__init__()
+    watcher.latencies = []
+    writes_before = fake_hass.FakeStore.writes
+
+    gc.collect()
+    if memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    for command, entity_id in zip(commands, watched):
+        watcher.watch([entity_id] if isinstance(entity_id, str) else entity_id, appear)
+        hass.states.async_set(input_entity, json.dumps(command))
+        # one command per loop iteration, like websocket messages arriving
+        await asyncio.sleep(0)
+    while watcher.sent or processor.queue.depth:
+        if time.perf_counter() - started > 600:
+            raise TimeoutError(f"{name}: {len(watcher.sent)} entities never changed")
+        await asyncio.sleep(0.001)
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1] if memory else None
+    if memory:
+        tracemalloc.stop()
+
+    await hass.async_block_till_done()
+    # let the delayed journal write and any compaction finish
+    while processor.journal.pending or processor._compact_task is not None:
+        await asyncio.sleep(0.05)
+
+    samples = sorted(watcher.latencies)
+    metrics = processor.metrics
+    return {
+        "phase": name,
+        "commands": len(commands),
+        "seconds": elapsed,
+        "rate": len(commands) / elapsed,
+        "p50": percentile(samples, 0.50),
+        "p95": percentile(samples, 0.95),
+        "p99": percentile(samples, 0.99),
+        "proc_p95": metrics.percentiles(integration("metrics").STAGE_TOTAL).get("p95"),
+        "peak_kib": peak / 1024 if peak is not None else None,
+        "store_writes": fake_hass.FakeStore.writes - writes_before,
+        "journal_writes": metrics.journal_writes,
+        "errors": sum(metrics.errors.values()),
+        "coalesced": metrics.coalesced,
+    }
+
+
+async def run_size(size: int, options: dict, memory: bool) -> list:
+    fake_hass.FakeStore.reset()
+    hass, entry = await fake_hass.async_setup(options)
+    processor = hass.data[integration("const").DOMAIN][entry.entry_id]
+    full_entity_id = integration("entity_table").full_entity_id
+    watcher = StateWatcher(hass)
+
+    creates = [create_command(i) for i in range(size)]
+    created = [full_entity_id(c["type"], c["entityID"]) for c in creates]
+    deletes = [{"command": "delete", "type": c["type"], "entityID": c["entityID"]} for c in creates[: size // 2]]
+
+    rows = [
+        await run_phase(hass, processor, watcher, "create", creates, created, True, memory),
+        await run_phase(hass, processor, watcher, "delete", deletes, created[: size // 2], False, memory),
+        await run_phase(hass, processor, watcher, "purge", [{"command": "purge"}],
+                        [created[size // 2:]], False, memory),
+    ]
+    await fake_hass.async_unload(hass, entry)
+    return rows
+
+
+def _fmt(value, spec: str) -> str:
+    return f"{'-':>{spec.split('.')[0].split(',')[0]}}" if value is None else format(value, spec)
+
+
+def parse_option(text: str):
+    key, _, value = text.partition("=")
+    for convert in (int, float):
+        try:
+            return key, convert(value)
+        except ValueError:
+            pass
+    return key, value
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--no-memory", action="store_true", help="skip tracemalloc (faster, no peak memory)")
+    parser.add_argument("--option", action="append", default=[], metavar="KEY=VALUE",
+                        help="config entry option, e.g. coalesce_window=0")
+    args = parser.parse_args()
+    options = dict(parse_option(option) for option in args.option)
+    # purges log a warning each
+    logging.basicConfig(level=logging.ERROR)
+
+    print(f"{'size':>6} {'phase':<7} {'cmds':>6} {'seconds':>8} {'cmd/s':>8} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'p99 ms':>8} {'proc p95':>8} {'peak KiB':>9} {'writes':>6} {'journal':>7} {'errors':>6} {'coalesced':>9}")
+    for size in args.sizes:
+        for row in asyncio.run(run_size(size, options, not args.no_memory)):
+            print(
+                f"{size:>6} {row['phase']:<7} {row['commands']:>6} {row['seconds']:>8.3f} {row['rate']:>8,.0f} "
+                f"{row['p50']:>8.1f} {row['p95']:>8.1f} {row['p99']:>8.1f} {_fmt(row['proc_p95'], '8.3f')} "
+                f"{_fmt(row['peak_kib'], '9,.0f')} {row['store_writes']:>6} {row['journal_writes']:>7} {row['errors']:>6} {row['coalesced']:>9}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,429 @@
+"""Lightweight in-process stand-in for Home Assistant, for the benchmarks.
+
+Only what the integration touches is implemented: the event bus, the state
+machine, the entity registry (with its unique_id index), the dispatcher, Store,
+config entries / entity platforms and service registration. Everything runs
+on the current event loop. Store is kept in memory; the entity journal is a
+real file (fsync included) in a temporary config directory.
+
+The integration modules import these helpers by name, so `patch_integration()`
+rebinds those names in every loaded module of the package. The entity classes
+still come from the installed homeassistant package, which must be importable.
+"""
+import asyncio
+import importlib
+import json
+import os
+import sys
+import tempfile
+import time
+import types
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from homeassistant.config_entries import ConfigEntryState
+from homeassistant.core import Event, State
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+PACKAGE = "custom_components.hs_command_listener"
+
+
+class FakeBus:
+    def __init__(self) -> None:
+        self._listeners: Dict[str, List[Callable]] = defaultdict(list)
+        self.fired = 0
+
+    def async_listen(self, event_type: str, listener: Callable) -> Callable[[], None]:
+        self._listeners[event_type].append(listener)
+        return lambda: self._listeners[event_type].remove(listener)
+
+    # nothing fires once-only (HA lifecycle) events here
+    async_listen_once = async_listen
+
+    def async_fire(self, event_type: str, event_data: Optional[dict] = None) -> None:
+        self.fired += 1
+        event = Event(event_type, event_data or {})
+        for listener in list(self._listeners.get(event_type, ())):
+            listener(event)
+
+
+class FakeStates:
+    """State machine; per-entity listeners stand in for async_track_state_change_event."""
+
+    def __init__(self) -> None:
+        self._states: Dict[str, State] = {}
+        self._trackers: Dict[str, List[Callable]] = defaultdict(list)
+        self.writes = 0
+
+    def get(self, entity_id: str) -> Optional[State]:
+        return self._states.get(entity_id)
+
+    def async_all(self, domain: Optional[str] = None) -> List[State]:
+        if domain is None:
+            return list(self._states.values())
+        prefix = f"{domain}."
+        return [state for entity_id, state in self._states.items() if entity_id.startswith(prefix)]
+
+    def async_set(self, entity_id: str, new_state: str, attributes: Optional[dict] = None) -> None:
+        self.writes += 1
+        old = self._states.get(entity_id)
+        state = State(entity_id, new_state, attributes)
+        self._states[entity_id] = state
+        self._notify(entity_id, old, state)
+
+    def async_remove(self, entity_id: str) -> bool:
+        old = self._states.pop(entity_id, None)
+        if old is None:
+            return False
+        self._notify(entity_id, old, None)
+        return True
+
+    def track(self, entity_ids: List[str], action: Callable) -> Callable[[], None]:
+        for entity_id in entity_ids:
+            self._trackers[entity_id].append(action)
+
+        def _unsub() -> None:
+            for entity_id in entity_ids:
+                self._trackers[entity_id].remove(action)
+
+        return _unsub
+
+    def _notify(self, entity_id: str, old: Optional[State], new: Optional[State]) -> None:
+        actions = self._trackers.get(entity_id)
+        if actions:
+            event = Event("state_changed", {"entity_id": entity_id, "old_state": old, "new_state": new})
+            for action in list(actions):
+                action(event)
+
+
+class FakeRegistryEntry:
+    __slots__ = ("entity_id", "domain", "platform", "unique_id", "config_entry_id")
+
+    def __init__(self, entity_id: str, domain: str, platform: str, unique_id: str, config_entry_id=None):
+        self.entity_id = entity_id
+        self.domain = domain
+        self.platform = platform
+        self.unique_id = unique_id
+        self.config_entry_id = config_entry_id
+
+
+class FakeEntityRegistry:
+    """entity_id -> entry, plus the (domain, platform, unique_id) index HA keeps."""
+
+    def __init__(self, hass: "FakeHass") -> None:
+        self.hass = hass
+        self.entities: Dict[str, FakeRegistryEntry] = {}
+        self._index: Dict[tuple, str] = {}
+        # entity_id -> callback that removes the live entity (its platform)
+        self._removers: Dict[str, Callable[[], None]] = {}
+
+    def async_get_entity_id(self, domain: str, platform: str, unique_id: str) -> Optional[str]:
+        return self._index.get((domain, platform, unique_id))
+
+    def async_get_or_create(
+        self, domain: str, platform: str, unique_id: str, *, suggested_entity_id: str, config_entry_id=None
+    ) -> FakeRegistryEntry:
+        entity_id = self._index.get((domain, platform, unique_id))
+        if entity_id is not None:
+            return self.entities[entity_id]
+        entry = FakeRegistryEntry(suggested_entity_id, domain, platform, unique_id, config_entry_id)
+        self.entities[entry.entity_id] = entry
+        self._index[(domain, platform, unique_id)] = entry.entity_id
+        return entry
+
+    def async_get(self, entity_id: str) -> Optional[FakeRegistryEntry]:
+        return self.entities.get(entity_id)
+
+    def async_remove(self, entity_id: str) -> None:
+        entry = self.entities.pop(entity_id)
+        del self._index[(entry.domain, entry.platform, entry.unique_id)]
+        remover = self._removers.pop(entity_id, None)
+        if remover is not None:
+            # HA removes the live entity from a registry-updated event listener
+            remover()
+
+
+class FakeStore:
+    """homeassistant.helpers.storage.Store kept in memory; counts and sizes the writes."""
+
+    # key -> data, survives a "restart" within one process
+    saved: Dict[str, Any] = {}
+    writes = 0
+    bytes_written = 0
+
+    def __init__(self, hass: "FakeHass", version: int, key: str, *args, **kwargs) -> None:
+        self.hass = hass
+        self.key = key
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self._data_func: Optional[Callable[[], Any]] = None
+
+    @property
+    def pending(self) -> bool:
+        return self._handle is not None
+
+    async def async_load(self) -> Any:
+        return FakeStore.saved.get(self.key)
+
+    async def async_save(self, data: Any) -> None:
+        self._cancel()
+        self._write(data)
+
+    def async_delay_save(self, data_func: Callable[[], Any], delay: float = 0) -> None:
+        self._data_func = data_func
+        self._cancel()
+        self._handle = self.hass.loop.call_later(delay, self._delayed_write)
+
+    def _delayed_write(self) -> None:
+        self._handle = None
+        self._write(self._data_func())
+
+    def _write(self, data: Any) -> None:
+        # HA serialises in the executor; the cost is still worth seeing
+        FakeStore.writes += 1
+        FakeStore.bytes_written += len(json.dumps(data))
+        FakeStore.saved[self.key] = data
+
+    def _cancel(self) -> None:
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    @classmethod
+    def reset(cls) -> None:
+        cls.saved, cls.writes, cls.bytes_written = {}, 0, 0
+
+
+class FakeDispatcher:
+    def __init__(self) -> None:
+        self._targets: Dict[str, List[Callable]] = defaultdict(list)
+
+    def connect(self, hass, signal: str, target: Callable) -> Callable[[], None]:
+        self._targets[signal].append(target)
+        return lambda: self._targets[signal].remove(target)
+
+    def send(self, hass, signal: str, *args) -> None:
+        for target in list(self._targets.get(signal, ())):
+            target(*args)
+
+
+class FakeEntityPlatform:
+    """One platform (switch, number, ...) of the config entry.
+
+    Adds entities the way EntityPlatform does, minus translations and device
+    info: registry entry, async_added_to_hass, first state write.
+    """
+
+    def __init__(self, hass: "FakeHass", domain: str, config_entry: "FakeConfigEntry") -> None:
+        self.hass = hass
+        self.domain = domain
+        self.config_entry = config_entry
+        self.entities: Dict[str, Any] = {}
+        self.add_calls = 0
+
+    def async_add_entities(self, new_entities, update_before_add: bool = False) -> None:
+        self.add_calls += 1
+        self.hass.async_create_task(self._async_add_entities(list(new_entities)))
+
+    async def _async_add_entities(self, new_entities) -> None:
+        registry = self.hass.entity_registry
+        for entity in new_entities:
+            entity.hass = self.hass
+            # DynamicEntity finds its config entry's processor through it
+            entity.platform = self
+            if entity.unique_id is not None:
+                entry = registry.async_get_or_create(
+                    self.domain, PACKAGE.rsplit(".", 1)[1], entity.unique_id,
+                    suggested_entity_id=entity.entity_id,
+                    config_entry_id=self.config_entry.entry_id,
+                )
+                entity.entity_id = entry.entity_id
+                entity.registry_entry = entry
+            if entity.entity_id in self.entities:
+                continue  # HA logs "does not generate unique IDs" and skips it
+            self.entities[entity.entity_id] = entity
+            self._bind(entity)
+            await entity.async_added_to_hass()
+            entity.async_write_ha_state()
+
+    def _bind(self, entity) -> None:
+        entity_id = entity.entity_id
+
+        def _write_state() -> None:
+            attributes = dict(entity.capability_attributes or {})
+            attributes["friendly_name"] = getattr(entity, "_attr_name", None)
+            state = entity.state
+            self.hass.states.async_set(entity_id, "unknown" if state is None else str(state), attributes)
+
+        async def _remove() -> None:
+            if self.entities.pop(entity_id, None) is None:
+                return
+            await entity.async_will_remove_from_hass()
+            self.hass.states.async_remove(entity_id)
+
+        # below Entity.async_write_ha_state, so DynamicEntity's override still runs
+        entity._async_write_ha_state = _write_state
+        entity.async_remove = _remove
+        self.hass.entity_registry._removers[entity_id] = lambda: self.hass.async_create_task(_remove())
+
+
+class FakeConfigEntry:
+    def __init__(self, entry_id: str = "bench", options: Optional[dict] = None, data: Optional[dict] = None,
+                 title: str = "HS Command Listener") -> None:
+        self.entry_id = entry_id
+        self.options = options or {}
+        self.data = data or {}
+        self.title = title
+        self.state = ConfigEntryState.NOT_LOADED
+        self._on_unload: List[Callable[[], None]] = []
+
+    def async_on_unload(self, func: Callable[[], None]) -> None:
+        self._on_unload.append(func)
+
+    def add_update_listener(self, listener: Callable) -> Callable[[], None]:
+        return lambda: None
+
+    def run_unload_callbacks(self) -> None:
+        while self._on_unload:
+            self._on_unload.pop()()
+
+
+class FakeConfigEntries:
+    def __init__(self, hass: "FakeHass") -> None:
+        self.hass = hass
+        self.entries: Dict[str, FakeConfigEntry] = {}
+        # (entry_id, domain) -> platform
+        self.platforms: Dict[tuple, FakeEntityPlatform] = {}
+
+    def async_entries(self, domain: Optional[str] = None) -> List[FakeConfigEntry]:
+        # every entry here is one of the integration's
+        return list(self.entries.values())
+
+    async def async_forward_entry_setups(self, entry: FakeConfigEntry, platforms) -> None:
+        for domain in platforms:
+            domain = str(domain)
+            module = importlib.import_module(f"{PACKAGE}.{domain}")
+            platform = FakeEntityPlatform(self.hass, domain, entry)
+            self.platforms[(entry.entry_id, domain)] = platform
+            await module.async_setup_entry(self.hass, entry, platform.async_add_entities)
+
+    async def async_unload_platforms(self, entry: FakeConfigEntry, platforms) -> bool:
+        for domain in platforms:
+            platform = self.platforms.pop((entry.entry_id, str(domain)), None)
+            if platform is not None:
+                for entity_id in list(platform.entities):
+                    await platform.entities[entity_id].async_remove()
+        entry.run_unload_callbacks()
+        return True
+
+
+class FakeServices:
+    def __init__(self) -> None:
+        self.handlers: Dict[tuple, Callable] = {}
+
+    def async_register(self, domain: str, service: str, handler: Callable, schema=None, supports_response=None):
+        self.handlers[(domain, service)] = handler
+
+    def async_remove(self, domain: str, service: str) -> None:
+        self.handlers.pop((domain, service), None)
+
+    def has_service(self, domain: str, service: str) -> bool:
+        return (domain, service) in self.handlers
+
+
+class FakeHass:
+    def __init__(self) -> None:
+        self.loop = asyncio.get_running_loop()
+        self.data: Dict[str, Any] = {}
+        self.bus = FakeBus()
+        self.states = FakeStates()
+        self.services = FakeServices()
+        self.entity_registry = FakeEntityRegistry(self)
+        self.dispatcher = FakeDispatcher()
+        self.config_entries = FakeConfigEntries(self)
+        self._config_dir = tempfile.TemporaryDirectory(prefix="hs_bench_")
+        self.config = types.SimpleNamespace(path=lambda *parts: os.path.join(self._config_dir.name, *parts))
+        self._tasks: set = set()
+
+    def async_create_task(self, target, name: Optional[str] = None) -> asyncio.Task:
+        task = self.loop.create_task(target)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def async_add_executor_job(self, target: Callable, *args) -> asyncio.Future:
+        return self.loop.run_in_executor(None, target, *args)
+
+    def async_create_background_task(self, target, name: str) -> asyncio.Task:
+        task = self.loop.create_task(target, name=name)
+        task.add_done_callback(lambda t: None)
+        return task
+
+    async def async_block_till_done(self) -> None:
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+        await asyncio.sleep(0)
+
+
+def _fake_helpers(hass: FakeHass) -> Dict[str, Any]:
+    """Names the integration imports from homeassistant, and their stand-ins."""
+    return {
+        "er": types.SimpleNamespace(async_get=lambda _hass: hass.entity_registry),
+        "async_dispatcher_send": hass.dispatcher.send,
+        "async_dispatcher_connect": hass.dispatcher.connect,
+        "async_track_state_change_event": lambda _hass, entity_ids, action: hass.states.track(entity_ids, action),
+        "async_call_later": lambda _hass, delay, action: hass.loop.call_later(delay, action, None).cancel,
+        "Store": FakeStore,
+    }
+
+
+def load_integration():
+    """Import the integration package and its modules (homeassistant must be installed)."""
+    if str(REPO_ROOT) not in sys.path:
+        sys.path.insert(0, str(REPO_ROOT))
+    package = importlib.import_module(PACKAGE)
+    package_dir = Path(package.__file__).parent
+    for path in sorted(package_dir.glob("*.py")):
+        if path.stem != "__init__":
+            importlib.import_module(f"{PACKAGE}.{path.stem}")
+    return package
+
+
+def patch_integration(hass: FakeHass) -> None:
+    """Rebind the homeassistant helpers imported by the integration to `hass`'s fakes."""
+    fakes = _fake_helpers(hass)
+    for name, module in list(sys.modules.items()):
+        if name == PACKAGE or name.startswith(PACKAGE + "."):
+            for attr, fake in fakes.items():
+                if hasattr(module, attr):
+                    setattr(module, attr, fake)
+
+
+async def async_setup(
+    options: Optional[dict] = None, entry_id: str = "bench", data: Optional[dict] = None,
+    hass: Optional[FakeHass] = None,
+):
+    """A fake hass with the integration set up through its own async_setup_entry.
+
+    Pass `hass` to set up a further config entry (e.g. with a prefix in `data`) on it.
+    """
+    package = load_integration()
+    if hass is None:
+        hass = FakeHass()
+        patch_integration(hass)
+    entry = FakeConfigEntry(entry_id, options, data)
+    hass.config_entries.entries[entry_id] = entry
+    started = time.perf_counter()
+    await package.async_setup_entry(hass, entry)
+    entry.state = ConfigEntryState.LOADED
+    await hass.async_block_till_done()
+    hass.setup_seconds = time.perf_counter() - started
+    return hass, entry
+
+
+async def async_unload(hass: FakeHass, entry: FakeConfigEntry) -> bool:
+    package = importlib.import_module(PACKAGE)
+    unloaded = await package.async_unload_entry(hass, entry)
+    entry.state = ConfigEntryState.NOT_LOADED
+    await hass.async_block_till_done()
+    return unloaded
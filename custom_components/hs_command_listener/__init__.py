@@ -4,33 +4,62 @@ from homeassistant.config_entries import ConfigEntry
 from homeassistant.helpers.dispatcher import async_dispatcher_send
 
 
-from .const import DOMAIN, PLATFORMS
+from .const import DOMAIN
 from .command_processor import CommandProcessor
+from .services import async_setup_services, async_unload_services
 
 _LOGGER = logging.getLogger(__name__)
 
 async def async_setup_entry(hass, entry: ConfigEntry):
     # Initialize command processor
-    processor = CommandProcessor(hass)
+    processor = CommandProcessor(hass, entry)
 
-    # forward the platforms FIRST
-    await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+    # Store processor in hass.data for later access/unload (platforms use its metrics),
+    # one per config entry
+    hass.data.setdefault(DOMAIN, {})[entry.entry_id] = processor
 
-    # now restore entities (platforms are ready)
+    # read storage, forward the platforms the stored entities need, then restore them
     await processor.async_initialize()
     _LOGGER.debug("CommandProcessor initialized with entities: %s", processor.entities)
-
-    # Store processor in hass.data for later access/unload
-    hass.data.setdefault(DOMAIN, {})["processor"] = processor
-    ###########################################
-    hass.async_create_task(processor.monitor())
-    ###########################################
+    # awaited, so an unload right after setup always finds the listeners to remove
+    await processor.monitor()
     _LOGGER.debug("CommandProcessor monitoring started")
 
-    # Forward setup to platform(s), like text
-    #await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+    # hs_command_listener.execute: direct ingress, the text entity stays as fallback
+    async_setup_services(hass)
 
     # Notify dynamic platforms to register ?
     async_dispatcher_send(hass, f"{DOMAIN}_platform_reload")
 
+    # options changes take effect through a reload
+    entry.async_on_unload(entry.add_update_listener(_async_update_listener))
+
     return True
+
+
+async def _async_update_listener(hass, entry: ConfigEntry):
+    await hass.config_entries.async_reload(entry.entry_id)
+
+
+async def async_unload_entry(hass, entry: ConfigEntry):
+    processor = hass.data.get(DOMAIN, {}).get(entry.entry_id)
+
+    # first stop listening and the command queue (nothing may create entities on
+    # platforms being unloaded), and write any pending (delayed) storage save
+    if processor:
+        await processor.async_shutdown()
+
+    # only the platforms that were set up, unloading any other one fails
+    platforms = processor.platforms if processor else set()
+    unload_ok = await hass.config_entries.async_unload_platforms(entry, list(platforms))
+    if unload_ok:
+        platforms.clear()
+        hass.data[DOMAIN].pop(entry.entry_id, None)
+        # the service is shared, it goes with the last entry
+        if not hass.data[DOMAIN]:
+            async_unload_services(hass)
+    elif processor:
+        # the entry stays loaded: listen and apply commands again
+        await processor.monitor()
+
+    return unload_ok
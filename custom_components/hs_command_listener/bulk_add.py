@@ -0,0 +1,88 @@
+import logging
+import time
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+from homeassistant.helpers.entity import Entity
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.event import async_call_later
+
+from .command import Command
+from .const import CONF_ADD_ENTITIES_WINDOW, DEFAULT_ADD_ENTITIES_WINDOW, SIGNAL_CREATE_ENTITY
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class BulkEntityAdder:
+    """Collect entities created in the same tick (or window) and add them in one call.
+
+    Every async_add_entities call is a separate platform add cycle with its own
+    registry lookups, so restoring a large set one entity at a time is slow.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        config_entry: ConfigEntry,
+        async_add_entities: AddEntitiesCallback,
+    ) -> None:
+        self.hass = hass
+        self._async_add_entities = async_add_entities
+        self._window = config_entry.options.get(CONF_ADD_ENTITIES_WINDOW, DEFAULT_ADD_ENTITIES_WINDOW)
+        # by entity_id: a later create of the same entity replaces the queued one
+        self._pending: dict[str, Entity] = {}
+        self._cancel: Optional[Callable[[], None]] = None
+
+    @callback
+    def add(self, entities: Iterable[Entity]) -> None:
+        for entity in entities:
+            self._pending[entity.entity_id] = entity
+        if self._cancel is not None or not self._pending:
+            return
+        if self._window > 0:
+            self._cancel = async_call_later(self.hass, self._window, self._flush)
+        else:
+            self._cancel = self.hass.loop.call_soon(self._flush).cancel
+
+    @callback
+    def _flush(self, _now=None) -> None:
+        self._cancel = None
+        entities, self._pending = list(self._pending.values()), {}
+        if entities:
+            _LOGGER.debug("Adding %s entities in one call", len(entities))
+            now = time.perf_counter()
+            for entity in entities:
+                entity.add_requested_at = now
+            self._async_add_entities(entities)
+
+    @callback
+    def async_cancel(self) -> None:
+        """Drop anything not yet added (called on unload)."""
+        if self._cancel is not None:
+            self._cancel()
+            self._cancel = None
+        self._pending.clear()
+
+
+@callback
+def async_setup_dynamic_entities(
+    hass: HomeAssistant,
+    config_entry: ConfigEntry,
+    async_add_entities: AddEntitiesCallback,
+    entity_type: str,
+    factory: Callable[[str, str, Command], Entity],
+) -> None:
+    """Add the entities of `entity_type` the processor dispatches, built by `factory`, in bulk."""
+    adder = BulkEntityAdder(hass, config_entry, async_add_entities)
+    config_entry.async_on_unload(adder.async_cancel)
+
+    @callback
+    def _handle_create(items: List[Tuple[str, str, Command]]) -> None:
+        adder.add([factory(entity_id, name, command) for entity_id, name, command in items])
+
+    # disconnected on unload, a reload must not stack a second handler
+    config_entry.async_on_unload(
+        async_dispatcher_connect(hass, SIGNAL_CREATE_ENTITY.format(config_entry.entry_id, entity_type), _handle_create)
+    )
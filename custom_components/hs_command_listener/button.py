@@ -2,13 +2,13 @@ import logging
 from homeassistant.core import HomeAssistant
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.components.button import ButtonEntity
-from .const import DOMAIN
+from .bulk_add import async_setup_dynamic_entities
+from .entity import DynamicEntity
 
 _LOGGER = logging.getLogger(__name__)
 
-class DynamicButton(ButtonEntity):
+class DynamicButton(DynamicEntity, ButtonEntity):
     def __init__(self, entity_id: str, name: str) -> None:
         self.entity_id = f"button.{entity_id}"
         self._attr_unique_id = f"button_{entity_id}"
@@ -24,13 +24,7 @@ async def async_setup_entry(
     async_add_entities: AddEntitiesCallback,
 ) -> None:
     """Register DynamicButton via dispatcher."""
-
-    async def _handle_create(entity_type, entity_id, name, command):
-        if entity_type != "BUTTON":
-            return
-
-        entity = DynamicButton(entity_id, name)
-        #async_add_entities([entity])
-        hass.async_create_task(async_add_entities([entity]))
-
-    async_dispatcher_connect(hass, f"{DOMAIN}_create_entity", _handle_create)
\ No newline at end of file
+    async_setup_dynamic_entities(
+        hass, config_entry, async_add_entities, "BUTTON",
+        lambda entity_id, name, command: DynamicButton(entity_id, name),
+    )
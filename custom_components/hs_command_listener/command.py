@@ -1,10 +1,141 @@
 import json
 from dataclasses import dataclass, fields, is_dataclass
-from typing import Type, TypeVar, Any, Dict, Optional, List
+from typing import Type, TypeVar, Any, Callable, Dict, Optional, List, Tuple
+
+from .const import COMMAND_CREATE, COMMAND_DEBUG, COMMAND_DELETE, COMMAND_PURGE, COMMAND_SET
+from .metrics import ERROR_INVALID_COMMAND, ERROR_MISSING_TYPE
+
+try:
+    # much faster than json, and Home Assistant ships it
+    from orjson import loads as _json_loads
+except ImportError:
+    _json_loads = json.loads
 
 T = TypeVar('T', bound='JsonDataclass')
 
+
+class CommandError(Exception):
+    """Raised when a command cannot be applied."""
+
+    def __init__(self, message: str, kind: str = ERROR_INVALID_COMMAND) -> None:
+        super().__init__(message)
+        self.kind = kind
+
+
+def load_json(json_str: str) -> Any:
+    # allow pretty-printed JSON (even raw line breaks inside strings)
+    if "\n" in json_str or "\r" in json_str:
+        json_str = json_str.replace("\r", "").replace("\n", "")
+    return _json_loads(json_str)
+
+
+def normalize_entity_id(entity_id: str) -> str:
+    return entity_id.strip().lower().replace(" ", "_")
+
+
+# ----------------------------------------------------------------------
+# Command schema: field -> (accepted types, description for errors)
+# ----------------------------------------------------------------------
+
+_STR = ((str,), "a string")
+_NUMBER = ((int, float), "a number")
+_BOOL = ((bool,), "a boolean")
+_STR_LIST = ((list,), "a list of strings")
+_OBJECT = ((dict,), "an object")
+
+FIELD_SPECS: Dict[str, Tuple[Tuple[type, ...], str]] = {
+    "command": _STR,
+    "type": _STR,
+    "entityID": _STR,
+    "name": _STR,
+    "force": _BOOL,
+    "min": _NUMBER,
+    "max": _NUMBER,
+    "step": _NUMBER,
+    "selects": _STR_LIST,
+    "pattern": _STR,
+    # write policy of the entity (DynamicEntity.async_write_value), all opt-in
+    "dedupe": _BOOL,
+    "max_rate": _NUMBER,
+    "deadband": _NUMBER,
+    # set: entity_id -> value
+    "values": _OBJECT,
+}
+
+# fields each command accepts / requires; other keys are ignored
+COMMAND_FIELDS: Dict[str, Tuple[str, ...]] = {
+    COMMAND_CREATE: tuple(name for name in FIELD_SPECS if name != "values"),
+    COMMAND_DELETE: ("command", "type", "entityID", "name", "force"),
+    COMMAND_PURGE: ("command", "type", "entityID"),
+    COMMAND_DEBUG: ("command", "type"),
+    COMMAND_SET: ("command", "values"),
+}
+REQUIRED_FIELDS: Dict[str, Tuple[str, ...]] = {
+    COMMAND_CREATE: ("type", "entityID"),
+    COMMAND_DELETE: ("type", "entityID"),
+    COMMAND_DEBUG: ("type",),
+    COMMAND_SET: ("values",),
+}
+
+
+def _compile_validator(command: str) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    """Build the validator for one command: checks types, drops unknown keys, normalises."""
+    specs = {name: FIELD_SPECS[name] for name in COMMAND_FIELDS.get(command, FIELD_SPECS)}
+    required = REQUIRED_FIELDS.get(command, ())
+    label = command or "command"
+    get_spec = specs.get
+
+    def validate(data: Dict[str, Any]) -> Dict[str, Any]:
+        for name in required:
+            if data.get(name) is None:
+                raise CommandError(f"{label}: missing required field '{name}'", ERROR_MISSING_TYPE)
+
+        clean = {}
+        for key, value in data.items():
+            spec = get_spec(key)
+            if spec is None or value is None:
+                continue
+            types, description = spec
+            # exact type first (all JSON decoders give those), then subclasses;
+            # bool is an int subclass, but true is not a number here
+            if type(value) not in types and (
+                not isinstance(value, types) or (isinstance(value, bool) and bool not in types)
+            ):
+                raise CommandError(
+                    f"{label}: field '{key}' must be {description}, got {type(value).__name__}"
+                )
+            clean[key] = value
+
+        selects = clean.get("selects")
+        if selects is not None:
+            for index, option in enumerate(selects):
+                if not isinstance(option, str):
+                    raise CommandError(
+                        f"{label}: field 'selects[{index}]' must be a string, got {type(option).__name__}"
+                    )
+        if clean.get("max_rate", 1) <= 0:
+            raise CommandError(f"{label}: field 'max_rate' must be greater than 0")
+        if clean.get("deadband", 0) < 0:
+            raise CommandError(f"{label}: field 'deadband' must not be negative")
+
+        clean["command"] = clean["command"].lower()
+        if "name" in clean:
+            clean["name"] = clean["name"].strip()
+        if "entityID" in clean:
+            clean["entityID"] = normalize_entity_id(clean["entityID"])
+        return clean
+
+    return validate
+
+
+_VALIDATORS = {command: _compile_validator(command) for command in COMMAND_FIELDS}
+_GENERIC_VALIDATOR = _compile_validator("")
+
+
 class JsonDataclass:
+    # empty slots so slotted dataclass subclasses stay free of a __dict__
+    __slots__ = ()
+
     @classmethod
     def from_json(cls: Type[T], json_str: str) -> T:
         data = json.loads(json_str)
@@ -24,7 +155,7 @@ class JsonDataclass:
         return obj
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Command(JsonDataclass):
     command: str
     type: Optional[str] = None
@@ -33,22 +164,32 @@ class Command(JsonDataclass):
     force: bool = True
     min: float = None
     max: float = None
+    step: Optional[float] = None
     selects: Optional[List[str]] = None
-
-    def post_init(self):
-        self.name = self.name.strip()
-        self.entityID = self.entityID.strip().lower().replace(" ", "_")
-        if not hasattr(self, "force") or self.force is None:
-            self.force = True
+    pattern: Optional[str] = None
+    # write policy: skip unchanged values, max state writes per second, number deadband
+    dedupe: Optional[bool] = None
+    max_rate: Optional[float] = None
+    deadband: Optional[float] = None
+    values: Optional[Dict[str, Any]] = None
 
     # called automatically after __init__
     def __post_init__(self) -> None:
         # If name is omitted or empty, use entityID
         if not self.name:
-            self.name = self.entityID
+            object.__setattr__(self, "name", self.entityID)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Command":
+        """Validate against the command's schema; raises CommandError naming the bad field."""
+        if not isinstance(data, dict):
+            raise CommandError(f"Command must be an object, got {type(data).__name__}")
+        command = data.get("command")
+        if not isinstance(command, str):
+            raise CommandError("missing required field 'command'")
+        validate = _VALIDATORS.get(command.lower(), _GENERIC_VALIDATOR)
+        return cls(**validate(data))
 
     @classmethod
     def from_json(cls, json_str: str) -> "Command":
-        # allow pretty-printed JSON
-        clean = json_str.replace("\r", "").replace("\n", "")
-        return cls(**json.loads(clean))
+        return cls.from_dict(load_json(json_str))
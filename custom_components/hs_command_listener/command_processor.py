@@ -1,186 +1,732 @@
 
+import asyncio
 import logging
+from fnmatch import fnmatchcase
+from homeassistant.config_entries import ConfigEntryState
+from homeassistant.core import callback
 from homeassistant.helpers import entity_registry as er
+from homeassistant.const import EVENT_HOMEASSISTANT_FINAL_WRITE, STATE_UNAVAILABLE, STATE_UNKNOWN
 from homeassistant.helpers.dispatcher import async_dispatcher_send
+from homeassistant.helpers.event import async_track_state_change_event
 
-from .const import DOMAIN, ENTITY_ID_COMMAND, STR_ENTITYID, STR_NAME, STR_TYPE
+from .const import DOMAIN, CONF_PREFIX, ENTITY_ID_COMMAND, EVENT_COMMAND, STR_ENTITYID, STR_TYPE, STR_ITEMS
 from .const import COMMAND_DEBUG, COMMAND_PURGE, COMMAND_CREATE, COMMAND_DELETE, COMMAND_ENABLE, COMMAND_DISABLE
-
-from .command import Command
-from .storage import EntityStore
+from .const import ADD_PENDING_TIMEOUT, BASE_PLATFORMS, ENTITY_TYPE_PLATFORMS, SIGNAL_CREATE_ENTITY
+from .const import COMMAND_BATCH, COMMAND_STATS, COMMAND_RECONCILE, COMMAND_SET, STR_HASH
+from .const import CONF_SAVE_DELAY, CONF_SAVE_MAX_DELAY, DEFAULT_SAVE_DELAY, DEFAULT_SAVE_MAX_DELAY
+from .const import CONF_QUEUE_SIZE, CONF_QUEUE_OVERFLOW, DEFAULT_QUEUE_SIZE, DEFAULT_QUEUE_OVERFLOW
+from .const import CONF_COALESCE_WINDOW, DEFAULT_COALESCE_WINDOW
+from .const import CONF_JOURNAL_FLUSH_DELAY, DEFAULT_JOURNAL_FLUSH_DELAY, JOURNAL_COMPACT_MIN
+from .const import CONF_CHUNK_TIMEOUT, CONF_CHUNK_MAX_BYTES, DEFAULT_CHUNK_TIMEOUT, DEFAULT_CHUNK_MAX_BYTES
+
+from .command import Command, CommandError, load_json, normalize_entity_id
+from .command_queue import CommandQueue
+from .metrics import CommandMetrics, STAGE_APPLY, STAGE_DISPATCH, STAGE_PARSE, STAGE_TOTAL
+from .metrics import ERROR_INVALID_COMMAND, ERROR_INVALID_JSON, ERROR_MISSING_TYPE
+from .metrics import ERROR_UNSUPPORTED_COMMAND, ERROR_UNSUPPORTED_TYPE
+from .entity_table import EntityRecord, EntityTable, entity_key, shadowed_prefix, unique_id_for
+from .framing import ChunkAssembler, is_chunk
+from .entity_table import command_from_record, record_from_command, record_value
+from .storage import EntityJournal, EntityStore, JOURNAL_KEY, STORAGE_KEY, VALUES_STORAGE_KEY, replay_journal, shard_key
 
 _LOGGER = logging.getLogger(__name__)
 
 class CommandProcessor:
-    def __init__(self, hass):
+    def __init__(self, hass, entry):
         self.hass = hass
-        self.store = EntityStore(hass)
-        self.entities = []
+        self.entry = entry
+        # one processor, input entity and storage shard per config entry
+        self.prefix = entry.data.get(CONF_PREFIX, "")
+        self.command_object_id = f"{ENTITY_ID_COMMAND}_{self.prefix}" if self.prefix else ENTITY_ID_COMMAND
+        self.metrics = CommandMetrics()
+        self.store = EntityStore(
+            hass,
+            entry.options.get(CONF_SAVE_DELAY, DEFAULT_SAVE_DELAY),
+            entry.options.get(CONF_SAVE_MAX_DELAY, DEFAULT_SAVE_MAX_DELAY),
+            self.metrics,
+            shard_key(STORAGE_KEY, self.prefix),
+        )
+        self.entities = EntityTable(prefix=self.prefix)
+        # changes to the table since the snapshot in self.store
+        self.journal = EntityJournal(
+            hass,
+            shard_key(JOURNAL_KEY, self.prefix),
+            entry.options.get(CONF_JOURNAL_FLUSH_DELAY, DEFAULT_JOURNAL_FLUSH_DELAY),
+            self.metrics,
+        )
+        self._compact_task = None
+        # dynamic entities of this entry currently added to HA, by unique_id
+        self.live = {}
+        # dispatched, not live yet: unique_id -> loop time of the dispatch
+        self.adding = {}
+        # entity values, by unique_id: one compact store instead of RestoreEntity lookups
+        self.value_store = EntityStore(
+            hass,
+            entry.options.get(CONF_SAVE_DELAY, DEFAULT_SAVE_DELAY),
+            entry.options.get(CONF_SAVE_MAX_DELAY, DEFAULT_SAVE_MAX_DELAY),
+            self.metrics,
+            shard_key(VALUES_STORAGE_KEY, self.prefix),
+            dict,
+        )
+        self.values = {}
+        # set: one values save for the whole command
+        self._defer_value_save = False
+        self.queue = CommandQueue(
+            hass,
+            self.process_command,
+            self.metrics,
+            entry.options.get(CONF_QUEUE_SIZE, DEFAULT_QUEUE_SIZE),
+            entry.options.get(CONF_QUEUE_OVERFLOW, DEFAULT_QUEUE_OVERFLOW),
+            self._coalesce_key,
+            self._process_coalesced,
+            entry.options.get(CONF_COALESCE_WINDOW, DEFAULT_COALESCE_WINDOW),
+        )
+        # frames of commands longer than the input entity's state
+        self.chunks = ChunkAssembler(
+            entry.options.get(CONF_CHUNK_TIMEOUT, DEFAULT_CHUNK_TIMEOUT),
+            entry.options.get(CONF_CHUNK_MAX_BYTES, DEFAULT_CHUNK_MAX_BYTES),
+            self._chunk_error,
+        )
+        # platforms forwarded for the config entry so far
+        self.platforms = set()
+        self._platform_lock = asyncio.Lock()
+        self._unsub_monitor = None
+        self._unsub_event = None
+        # hash of the last applied reconcile, cleared by any other change
+        self._reconcile_hash = None
+        # state change events delivered to the listener vs. commands they carried
+        self.events_delivered = 0
+        self.events_processed = 0
 
 
     async def async_initialize(self):
-        self.entities = await self.store.async_load()
+        # the snapshot, then the changes journaled after it
+        self.entities = EntityTable(await self.store.async_load(), self.prefix)
+        replay = await self.journal.async_load()
+        replay_journal(self.entities, replay)
+        if replay:
+            _LOGGER.debug("Replayed %s journal entries", len(replay))
+            await self.journal.async_compact(self.store, self._data_to_save)
+        # HA stops without unloading: write what is still buffered
+        self.entry.async_on_unload(
+            self.hass.bus.async_listen_once(EVENT_HOMEASSISTANT_FINAL_WRITE, self._async_final_write)
+        )
         _LOGGER.debug("Restoring %s entities from storage", len(self.entities))
+        # read once; each entity takes its value when added (DynamicEntity.async_added_to_hass)
+        self.values = {
+            unique_id: value
+            for unique_id, value in (await self.value_store.async_load()).items()
+            if self.entities.get_by_unique_id(unique_id) is not None
+        }
+        # only the platforms of stored entities, any other loads with its first create
+        await self.async_setup_platforms(
+            {ENTITY_TYPE_PLATFORMS[item.type] for item in self.entities if item.type in ENTITY_TYPE_PLATFORMS}
+        )
+        # one dispatch per entity type, the platforms add each list in one call
+        pending = {}
         for item in self.entities:
-            await self._dispatch_create(item[STR_TYPE], item[STR_ENTITYID], item[STR_NAME], Command(
-                command=COMMAND_CREATE,
-                type=item[STR_TYPE],
-                name=item[STR_NAME],
-                entityID=item[STR_ENTITYID],
-                force=False
-            ))
+            pending[item.key] = command_from_record(item)
+        await self._dispatch_pending(pending)
+
+
+    async def async_setup_platforms(self, platforms) -> None:
+        """Forward BASE_PLATFORMS and `platforms` to the config entry, those not set up yet."""
+        async with self._platform_lock:
+            new = [p for p in dict.fromkeys([*BASE_PLATFORMS, *sorted(platforms)]) if p not in self.platforms]
+            if not new:
+                return
+            _LOGGER.debug("Setting up platforms %s", new)
+            config_entries = self.hass.config_entries
+            # newer HA wants forwards after setup to take the setup lock
+            forward = getattr(config_entries, "async_late_forward_entry_setups", None)
+            if forward is None or self.entry.state is not ConfigEntryState.LOADED:
+                forward = config_entries.async_forward_entry_setups
+            await forward(self.entry, new)
+            self.platforms.update(new)
+
+
+    async def async_shutdown(self):
+        """Stop listening, finish the queued commands and write pending storage (unload)."""
+        if self._unsub_monitor is not None:
+            self._unsub_monitor()
+            self._unsub_monitor = None
+        if self._unsub_event is not None:
+            self._unsub_event()
+            self._unsub_event = None
+        await self.queue.async_stop()
+        self.chunks.clear()
+        if self._compact_task is not None:
+            await self._compact_task
+        # the next setup starts from the snapshot alone
+        if self.journal.entries:
+            await self.journal.async_compact(self.store, self._data_to_save)
+        await self.value_store.async_flush()
+
+
+    def _data_to_save(self) -> list:
+        return self.entities.as_list()
+
+
+    @callback
+    def _entities_changed(self) -> None:
+        """Write the journaled changes soon; compact once the journal outgrows the table."""
+        self.journal.async_delay_flush()
+        if self._compact_task is None and self.journal.entries >= max(JOURNAL_COMPACT_MIN, len(self.entities)):
+            self._compact_task = self.hass.async_create_task(self._async_compact())
+
+
+    async def _async_compact(self) -> None:
+        try:
+            await self.journal.async_compact(self.store, self._data_to_save)
+        finally:
+            self._compact_task = None
+
+
+    async def _async_final_write(self, _event) -> None:
+        await self.journal.async_flush()
+
+
+    def _values_to_save(self) -> dict:
+        return dict(self.values)
+
+
+    @callback
+    def async_value_changed(self, unique_id: str, value) -> None:
+        """Remember an entity's new value; written with the next batched values save."""
+        if value is None or (unique_id in self.values and self.values[unique_id] == value):
+            return
+        self.values[unique_id] = value
+        if not self._defer_value_save:
+            self.value_store.async_delay_save(self._values_to_save)
 
 
     async def monitor(self):
-        _LOGGER.debug("Monitoring state changes for %s", ENTITY_ID_COMMAND)
+        _LOGGER.debug("Monitoring state changes for text.%s", self.command_object_id)
 
-        async def _listener(event):
-            entity_id = event.data.get("entity_id")
-            if entity_id.startswith("text."):
-                _LOGGER.debug("Event state change from id: '%s', data: %s", entity_id, event.data)
+        self.queue.async_start()
 
-            if entity_id != f"text.{ENTITY_ID_COMMAND}":
-                return
+        # only the command input entity: no callback for the rest of the state machine
+        @callback
+        def _listener(event):
+            self.events_delivered += 1
 
             state = event.data.get("new_state")
             _LOGGER.debug("Detected text entity state change: %s", state)
-            if not state or not state.state:
+            if not state or not state.state or state.state in (STATE_UNAVAILABLE, STATE_UNKNOWN):
                 return
 
+            self.events_processed += 1
+            payload = state.state
+            if is_chunk(payload):
+                # queued once complete, as one command
+                try:
+                    payload = self.chunks.feed(payload)
+                except CommandError as exc:
+                    self._chunk_error(exc.kind, str(exc))
+                    return
+                if payload is None:
+                    return
             #######################################
-            await self.process_command(state.state)
+            self.queue.async_put(payload)
             #######################################
 
-        self.hass.bus.async_listen("state_changed", _listener)
+        self._unsub_monitor = async_track_state_change_event(
+            self.hass, [f"text.{self.command_object_id}"], _listener
+        )
+
+        # same commands as bus event data, without the text entity's state machine
+        @callback
+        def _event_listener(event):
+            self.events_delivered += 1
+            data = dict(event.data)
+            if data.pop(CONF_PREFIX, "") != self.prefix:
+                return  # for another config entry
+            self.events_processed += 1
+            self.queue.async_put(data)
+
+        self._unsub_event = self.hass.bus.async_listen(EVENT_COMMAND, _event_listener)
+
+
+    @callback
+    def _chunk_error(self, kind: str, message: str) -> None:
+        _LOGGER.warning("%s", message)
+        self.metrics.error(kind)
 
 
     # Example: {"command": "create", "type": "TOGGLE", "name": "XXX"}
-    async def process_command(self, raw: str):
+    # Batch:   [{...}, {...}] or {"command": "batch", "items": [{...}, {...}]}
+    async def process_command(self, raw: str | dict | list) -> dict:
+        """Process a JSON string (text entity) or already decoded data (service/event).
+
+        Returns {"success": bool, "error": str} or, for a batch, {"success": bool, "results": [...]}.
+        """
+        with self.metrics.time(STAGE_TOTAL):
+            return await self._process_command(raw)
+
+
+    async def _process_command(self, raw: str | dict | list) -> dict:
+        if isinstance(raw, str):
+            try:
+                if not raw.strip():
+                    _LOGGER.debug("Empty command received; ignoring")
+                    return {"success": False, "error": "Empty command"}
+                with self.metrics.time(STAGE_PARSE):
+                    data = load_json(raw)
+            except Exception as exc:
+                _LOGGER.warning("Invalid command JSON: %s", exc)
+                self.metrics.error(ERROR_INVALID_JSON)
+                return {"success": False, "error": f"Invalid command JSON: {exc}"}
+        else:
+            data = raw
+
+        if isinstance(data, list) or (
+            isinstance(data, dict) and str(data.get("command", "")).lower() == COMMAND_BATCH
+        ):
+            items = data if isinstance(data, list) else data.get(STR_ITEMS) or []
+            if not isinstance(items, list):
+                self.metrics.command()
+                return {"success": False, "error": "Batch requires the items list"}
+            self.metrics.command(len(items))
+            with self.metrics.time(STAGE_APPLY):
+                results = await self._process_batch(items)
+            return {"success": all(r["success"] for r in results), "results": results}
+
+        self.metrics.command()
+        if isinstance(data, dict) and str(data.get("command", "")).lower() == COMMAND_RECONCILE:
+            with self.metrics.time(STAGE_APPLY):
+                return await self._reconcile(data)
+
         try:
-            if not raw.strip():
-                _LOGGER.debug("Empty command received; ignoring")
-                return
-            cmd = Command.from_json(raw)
-        except Exception as exc:
-            _LOGGER.warning("Invalid command JSON: %s", exc)
-            return
+            with self.metrics.time(STAGE_PARSE):
+                cmd = Command.from_dict(data)
+        except CommandError as exc:
+            _LOGGER.warning("Invalid command: %s", exc)
+            self.metrics.error(exc.kind)
+            return {"success": False, "error": f"Invalid command: {exc}"}
+
+        if cmd.command == COMMAND_SET:
+            with self.metrics.time(STAGE_APPLY):
+                return self._set_values(cmd)
 
+        try:
+            with self.metrics.time(STAGE_APPLY):
+                await self._apply(cmd)
+        except CommandError as exc:
+            _LOGGER.warning("%s", exc)
+            self.metrics.error(exc.kind)
+            return {"success": False, "error": str(exc)}
+        return {"success": True}
+
+
+    def _coalesce_key(self, payload):
+        """(key, decoded payload); the key is (TYPE, entityID) for a plain create/delete.
+
+        Only those may be collapsed by the queue: for one entity the last one wins
+        (delete+create becomes a create, which updates the live entity in place).
+        """
+        data = payload
+        if isinstance(payload, str):
+            try:
+                data = load_json(payload)
+            except Exception:
+                return None, payload
+        if (
+            isinstance(data, dict)
+            and str(data.get("command", "")).lower() in (COMMAND_CREATE, COMMAND_DELETE)
+            and isinstance(data.get(STR_TYPE), str)
+            and isinstance(data.get(STR_ENTITYID), str)
+        ):
+            return entity_key(data[STR_TYPE], normalize_entity_id(data[STR_ENTITYID])), data
+        return None, data
+
+
+    async def _process_coalesced(self, items: list) -> list:
+        """Apply the commands left after coalescing as one batch, one result each."""
+        response = await self.process_command(items)
+        # same shape as a single command's result
+        return [
+            {k: v for k, v in result.items() if k in ("success", "error")}
+            for result in response["results"]
+        ]
+
+
+    async def _apply(self, cmd: Command, pending: dict | None = None, save: bool = True):
+        """Apply one parsed command, raise CommandError if it can't be applied.
+
+        With `pending` the create dispatch is deferred to the caller (batch mode).
+        """
         #####################################################################
-        if await self._handle_special_command(cmd):
+        if await self._handle_special_command(cmd, pending):
             return
         #####################################################################
 
         if cmd.command == COMMAND_CREATE:
-            await self._create(cmd)
+            await self._create(cmd, pending, save)
         elif cmd.command == COMMAND_DELETE:
-            await self._delete(cmd)
+            await self._delete(cmd, pending, save)
+        elif cmd.command == COMMAND_SET:
+            response = self._set_values(cmd)
+            if not response["success"]:
+                raise CommandError(f"set failed for {', '.join(response['errors'])}")
         else:
-            _LOGGER.warning("Unsupported command: %s", cmd.command)
-
-
-    async def _create(self, cmd: Command):
+            raise CommandError(f"Unsupported command: {cmd.command}", ERROR_UNSUPPORTED_COMMAND)
+
+
+    async def _process_batch(self, items: list) -> list:
+        """Apply a list of commands as one unit: one dispatch per platform, one save.
+
+        A failing item is reported and skipped, the rest of the batch still runs.
+        """
+        _LOGGER.debug("Processing BATCH of %s commands", len(items))
+        results = []
+        pending = {}
+
+        for index, item in enumerate(items):
+            result = {"index": index, "success": True}
+            try:
+                if not isinstance(item, dict):
+                    raise CommandError(f"Batch item must be an object, got {type(item).__name__}")
+                cmd = Command.from_dict(item)
+                result["command"] = cmd.command
+                result[STR_ENTITYID] = cmd.entityID
+                if cmd.command.lower() == COMMAND_BATCH:
+                    raise CommandError("Nested batch is not supported")
+                await self._apply(cmd, pending, save=False)
+            except CommandError as exc:
+                result["success"] = False
+                result["error"] = str(exc)
+                self.metrics.error(exc.kind)
+                _LOGGER.warning("Batch item %s failed: %s", index, exc)
+            results.append(result)
+
+        await self._dispatch_pending(pending)
+        self._entities_changed()
+
+        failed = sum(1 for r in results if not r["success"])
+        _LOGGER.debug("Batch processed: %s succeeded, %s failed", len(results) - failed, failed)
+        return results
+
+
+    # {"command": "reconcile", "hash": "...", "items": [{"type": ..., "entityID": ..., "name": ...}, ...]}
+    async def _reconcile(self, data: dict) -> dict:
+        """Make the stored entity set equal to `items`, applying only the difference.
+
+        If `hash` equals the hash of the last applied reconcile (and nothing changed
+        since) nothing is done; `items` may then be omitted. The hash is kept in memory.
+        An invalid item is reported in `results` and its entity, if any, is kept as it is.
+        If an invalid item does not even name an entity, nothing is removed.
+        """
+        digest = data.get(STR_HASH)
+        if digest is not None and digest == self._reconcile_hash:
+            _LOGGER.debug("Reconcile hash unchanged, nothing to do")
+            return {"success": True, "unchanged": True}
+
+        items = data.get(STR_ITEMS)
+        if not isinstance(items, list):
+            return {"success": False, "unchanged": False, "error": "Reconcile requires the items list"}
+
+        desired = {}
+        # entities named by an invalid item: left as they are, neither changed nor removed
+        invalid = set()
+        # an invalid item without type/entityID could be any entity: remove none
+        unkeyed = False
+        errors = []
+        for index, item in enumerate(items):
+            try:
+                cmd = Command.from_dict({**item, "command": COMMAND_CREATE})
+                if cmd.type.upper() not in ENTITY_TYPE_PLATFORMS:
+                    raise CommandError(f"Unsupported entity type: {cmd.type}", ERROR_UNSUPPORTED_TYPE)
+                self._check_namespace(cmd.entityID)
+            except Exception as exc:
+                self.metrics.error(getattr(exc, "kind", ERROR_INVALID_COMMAND))
+                errors.append({"index": index, "success": False, "error": str(exc)})
+                if (
+                    isinstance(item, dict)
+                    and isinstance(item.get(STR_TYPE), str)
+                    and isinstance(item.get(STR_ENTITYID), str)
+                ):
+                    invalid.add(entity_key(item[STR_TYPE], normalize_entity_id(item[STR_ENTITYID])))
+                else:
+                    unkeyed = True
+                continue
+            desired[entity_key(cmd.type, cmd.entityID)] = cmd
+
+        removes = [] if unkeyed else [r for r in self.entities if r.key not in desired and r.key not in invalid]
+        adds, changes = [], []
+        for key, cmd in desired.items():
+            record = self.entities.get(*key)
+            if record is None:
+                adds.append(cmd)
+            elif record != record_from_command(cmd) or not self._is_present(record):
+                changes.append(cmd)
+
+        pending = {}
+        self._remove_entities([r.key for r in removes], pending)
+        for cmd in adds + changes:
+            await self._create(cmd, pending, save=False)
+        await self._dispatch_pending(pending)
+
+        if removes or adds or changes:
+            self._entities_changed()
+        # a partially applied set must not be skipped next time
+        self._reconcile_hash = digest if not errors else None
+
+        _LOGGER.info(
+            "Reconcile: %s added, %s removed, %s changed, %s invalid",
+            len(adds), len(removes), len(changes), len(errors)
+        )
+        response = {
+            "success": not errors,
+            "unchanged": False,
+            "added": len(adds),
+            "removed": len(removes),
+            "changed": len(changes),
+        }
+        if errors:
+            response["results"] = errors
+        return response
+
+
+    async def _create(self, cmd: Command, pending: dict | None = None, save: bool = True):
         _LOGGER.debug("Processing CREATE command: %s", cmd)
         if cmd.type is None or cmd.entityID is None:
-            _LOGGER.warning("CREATE/DELETE requires type and entityID")
+            raise CommandError("CREATE/DELETE requires type and entityID", ERROR_MISSING_TYPE)
+        if cmd.type.upper() not in ENTITY_TYPE_PLATFORMS:
+            raise CommandError(f"Unsupported entity type: {cmd.type}", ERROR_UNSUPPORTED_TYPE)
+        self._check_namespace(cmd.entityID)
+
+        record = record_from_command(cmd)
+        existing = self.entities.get(cmd.type, cmd.entityID)
+        unique_id = self.entities.unique_id(cmd.type, cmd.entityID)
+        live = self.live.get(unique_id)
+        if existing == record:
+            if live is not None or self._is_adding(unique_id):
+                _LOGGER.debug("%s %s unchanged, nothing to create", cmd.type, cmd.entityID)
+                return
+            # stored but not in HA (removed in the UI, failed add): add it again
+            if pending is None:
+                await self._dispatch_create(cmd.type, [(self.entities.object_id(cmd.entityID), cmd.name, cmd)])
+            else:
+                pending[entity_key(cmd.type, cmd.entityID)] = cmd
             return
-        # Remove any duplicate record in self.entities
-        self.entities = [e for e in self.entities if not (e[STR_TYPE]==cmd.type and e[STR_ENTITYID]==cmd.entityID)]
-        await self._dispatch_create(cmd.type, cmd.entityID, cmd.name, cmd)
-        self.entities.append({STR_TYPE: cmd.type, STR_ENTITYID: cmd.entityID, STR_NAME: cmd.name})
-        await self.store.async_save(self.entities)
-
-
-    async def _dispatch_create(self, etype, entity_id, name, cmd):
-        async_dispatcher_send(
-            self.hass,
-            f"{DOMAIN}_create_entity",
-            etype.upper(),
+
+        if existing is not None and live is not None:
+            # only attributes changed: update the live entity, HA would reject a re-add
+            live.async_update_from_command(cmd.name, cmd)
+        elif pending is None:
+            await self._dispatch_create(cmd.type, [(self.entities.object_id(cmd.entityID), cmd.name, cmd)])
+        else:
+            pending[entity_key(cmd.type, cmd.entityID)] = cmd
+        # replaces any duplicate record
+        self.entities.add(record)
+        self.journal.append_add(record.as_dict())
+        self._reconcile_hash = None
+        if save:
+            self._entities_changed()
+
+
+    def _check_namespace(self, entity_id: str) -> None:
+        """Refuse an entityID whose entity ids belong to an entry with a longer prefix."""
+        other = shadowed_prefix(
             entity_id,
-            name,
-            cmd
+            self.prefix,
+            (entry.data.get(CONF_PREFIX, "") for entry in self.hass.config_entries.async_entries(DOMAIN)),
         )
-
-
-    async def _delete(self, cmd: Command):
+        if other is not None:
+            raise CommandError(
+                f"entityID {entity_id} would get the entity ids ({self.entities.object_id(entity_id)}) "
+                f"of the entry with prefix '{other}'"
+            )
+
+
+    # Example: {"command": "set", "values": {"switch.homeseer_713": true, "number.homeseer_1021": 21.5}}
+    def _set_values(self, cmd: Command) -> dict:
+        """Set the values of many dynamic entities in one pass, with a single values save.
+
+        Keys are entity_ids as created (platform.[prefix_]entityID). An entity still being
+        added gets the value when it is. Returns {"success", "updated", "errors"}.
+        """
+        live = self.live
+        errors = {}
+        updated = 0
+        self._defer_value_save = True
+        try:
+            for entity_id, value in cmd.values.items():
+                record = self.entities.get_by_entity_id(entity_id)
+                if record is None:
+                    errors[entity_id] = "Unknown entity"
+                    continue
+                unique_id = self.entities.unique_id(record.type, record.entityID)
+                entity = live.get(unique_id)
+                try:
+                    if entity is None:
+                        # not added yet: checked against the record, taken from the
+                        # values in async_added_to_hass
+                        self.async_value_changed(unique_id, record_value(record, value))
+                    else:
+                        entity.async_set_from_command(value)
+                except ValueError as exc:
+                    errors[entity_id] = str(exc) if entity is not None else f"{entity_id}: {exc}"
+                    continue
+                updated += 1
+        finally:
+            self._defer_value_save = False
+
+        if updated:
+            self.value_store.async_delay_save(self._values_to_save)
+        if errors:
+            _LOGGER.warning("set: %s of %s values rejected: %s", len(errors), len(cmd.values), errors)
+            self.metrics.error(ERROR_INVALID_COMMAND)
+            return {"success": False, "updated": updated, "errors": errors}
+        return {"success": True, "updated": updated}
+
+
+    def _is_adding(self, unique_id: str) -> bool:
+        dispatched = self.adding.get(unique_id)
+        return dispatched is not None and self.hass.loop.time() - dispatched < ADD_PENDING_TIMEOUT
+
+
+    def _is_present(self, record: EntityRecord) -> bool:
+        """The record's entity is in HA or being added."""
+        unique_id = self.entities.unique_id(record.type, record.entityID)
+        return unique_id in self.live or self._is_adding(unique_id)
+
+
+    async def _dispatch_create(self, etype, items):
+        """items: list of (object_id, name, cmd) tuples of the same type."""
+        now = self.hass.loop.time()
+        for object_id, _, _ in items:
+            self.adding[unique_id_for(etype, object_id)] = now
+        platform = ENTITY_TYPE_PLATFORMS[etype.upper()]
+        if platform not in self.platforms:
+            # first entity of this type: nothing listens for the signal yet
+            await self.async_setup_platforms([platform])
+        with self.metrics.time(STAGE_DISPATCH):
+            async_dispatcher_send(
+                self.hass,
+                SIGNAL_CREATE_ENTITY.format(self.entry.entry_id, etype.upper()),
+                items
+            )
+
+
+    async def _dispatch_pending(self, pending: dict):
+        """Send the deferred creates, one dispatcher pass per entity type."""
+        by_type = {}
+        for (etype, entity_id), cmd in pending.items():
+            by_type.setdefault(etype, []).append((self.entities.object_id(entity_id), cmd.name, cmd))
+        pending.clear()
+        for etype, items in by_type.items():
+            await self._dispatch_create(etype, items)
+
+
+    async def _delete(self, cmd: Command, pending: dict | None = None, save: bool = True):
         if cmd.type is None or cmd.entityID is None:
-            _LOGGER.warning("CREATE/DELETE requires type and entityID")
-            return
-
-        uid = f"{cmd.type.lower()}_{cmd.entityID}"
-        entity_id = f"{cmd.type.lower()}.{cmd.entityID}"
-
-        # 1️ Remove from registry
-        registry = er.async_get(self.hass)
-        to_remove = [e.entity_id for e in registry.entities.values() if e.unique_id == uid]
-        for ent_id in to_remove:
-            registry.async_remove(ent_id)
-            _LOGGER.debug("Removed entity from registry: %s", ent_id)
-
-        # 2️ Remove from the running state-machine
-        self.hass.states.async_remove(entity_id)
-
-        # 3️ Remove the preserved “restore” entry so it won’t come back on restart
-        restorer: RestoreStateData | None = self.hass.data.get("restore_state")
-        if restorer and entity_id in restorer.last_states:
-            del restorer.last_states[entity_id]
+            raise CommandError("CREATE/DELETE requires type and entityID", ERROR_MISSING_TYPE)
+
+        self._remove_entities([(cmd.type, cmd.entityID)], pending)
+        if save:
+            self._entities_changed()
+
+
+    # {"command": "purge"} or filtered: {"command": "purge", "type": "SELECT", "entityID": "homeseer_7*"}
+    async def _purge(self, command: Command, pending: dict | None = None, save: bool = True) -> None:
+        """Delete every dynamic entity we know about (or those matching type/entityID pattern)."""
+        etype = command.type.upper() if command.type else None
+        pattern = command.entityID
+
+        def _match(item_type: str, item_id: str) -> bool:
+            return (etype is None or item_type.upper() == etype) and (
+                pattern is None or fnmatchcase(item_id, pattern)
+            )
+
+        targets = [
+            item.key
+            for item in self.entities
+            if _match(item.type, item.entityID)
+        ]
+        if pending:
+            for key in [k for k in pending if _match(*k)]:
+                del pending[key]
+
+        self._remove_entities(targets)
+
+        if save:
+            self._entities_changed()
+        if etype is None and pattern is None:
+            _LOGGER.warning("All dynamic entities purged from registry, state, and storage")
+        else:
+            _LOGGER.warning(
+                "%s dynamic entities (type %s, entityID %s) purged from registry, state, and storage",
+                len(targets), etype or "*", pattern or "*"
+            )
 
-        # 4️ Update our own storage
-        self.entities = [e for e in self.entities if not (e[STR_TYPE]==cmd.type and e[STR_ENTITYID]==cmd.entityID)]
-        await self.store.async_save(self.entities)
 
+    def _remove_entities(self, targets: list, pending: dict | None = None) -> None:
+        """Remove (type, entityID) targets from registry, state machine, stored values and table.
 
-    async def _purge(self) -> None:
-        """Delete every dynamic entity we know about — registry, states, storage."""
+        One pass; the registry is queried through its unique_id index, not scanned.
+        """
         registry = er.async_get(self.hass)
+        values_changed = False
 
-        # iterate over a copy, because we'll mutate self.entities
-        for item in list(self.entities):
-            entity_type = item[STR_TYPE]
-            entity_id   = item[STR_ENTITYID]
+        for etype, entity_id in targets:
+            # A create for this entity still waiting in the batch must not resurrect it
+            if pending:
+                pending.pop(entity_key(etype, entity_id), None)
 
             # full entity_id, e.g. "switch.homeseer_713"
-            full_id = f"{entity_type.lower()}.{entity_id}"
-            uid     = f"{entity_type.lower()}_{entity_id}"
+            full_id = self.entities.entity_id(etype, entity_id)
+            platform = full_id.split(".", 1)[0]
 
-            # 1️. remove from registry
-            ent = registry.async_get(full_id)
-            if ent:
-                registry.async_remove(full_id)
+            # 1️. remove from registry (it may have been renamed by the user)
+            unique_id = self.entities.unique_id(etype, entity_id)
+            reg_id = registry.async_get_entity_id(platform, DOMAIN, unique_id)
+            if reg_id:
+                registry.async_remove(reg_id)
+                _LOGGER.debug("Removed entity from registry: %s", reg_id)
 
-            # 2️. remove from running state-machine
-            self.hass.states.async_remove(full_id)
+            # 2️. remove from the running state-machine
+            self.hass.states.async_remove(reg_id or full_id)
 
-            # 3️. remove from restore cache
-            restorer = self.hass.data.get("restore_state")
-            if restorer and full_id in restorer.last_states:
-                del restorer.last_states[full_id]
+            self.adding.pop(unique_id, None)
 
-            # 4️. drop from our internal list
-            self.entities.remove(item)
+            # 3️. forget its value so a later create starts from the default
+            if self.values.pop(unique_id, None) is not None:
+                values_changed = True
 
-        await self.store.async_save(self.entities)
-        _LOGGER.warning("All dynamic entities purged from registry, state, and storage")
+            # 4️. drop from our internal table
+            if self.entities.remove(etype, entity_id) is not None:
+                self.journal.append_remove(etype, entity_id)
 
+        self._reconcile_hash = None
+        if values_changed:
+            self.value_store.async_delay_save(self._values_to_save)
 
 
-    async def _handle_special_command(self, command: Command) -> bool:
+    async def _handle_special_command(self, command: Command, pending: dict | None = None) -> bool:
         global DEBUG_ENABLED
         cmd = command.command.lower()
         if cmd == COMMAND_DEBUG:
-            if command.type.upper() == COMMAND_ENABLE:
+            dtype = (command.type or "").lower()
+            if dtype == COMMAND_ENABLE:
                 DEBUG_ENABLED = True
                 _LOGGER.setLevel(logging.DEBUG)
                 _LOGGER.debug("Debug logging ENABLED")
-            elif command.type.upper() == COMMAND_DISABLE:
+            elif dtype == COMMAND_DISABLE:
                 DEBUG_ENABLED = False
                 _LOGGER.setLevel(logging.INFO)
                 _LOGGER.info("Debug logging DISABLED")
+            elif dtype == COMMAND_STATS:
+                _LOGGER.info(
+                    "Events delivered: %s, processed: %s, entities: %s",
+                    self.events_delivered, self.events_processed, len(self.entities)
+                )
             else:
                 _LOGGER.warning("Unknown debug command type: %s", command.type)
             return True
 
         elif cmd == COMMAND_PURGE:
-            await self._purge()
+            await self._purge(command, pending, save=pending is None)
             return True
 
         return False
\ No newline at end of file
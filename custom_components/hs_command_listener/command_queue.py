@@ -0,0 +1,199 @@
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, List, Optional, Tuple
+
+from homeassistant.core import HomeAssistant, callback
+
+from .const import DEFAULT_COALESCE_WINDOW, DEFAULT_QUEUE_OVERFLOW, DEFAULT_QUEUE_SIZE, OVERFLOW_REJECT
+from .metrics import CommandMetrics, ERROR_QUEUE_OVERFLOW
+
+_LOGGER = logging.getLogger(__name__)
+
+# payload, future of the caller, loop time it was queued
+Item = Tuple[Any, Optional[asyncio.Future], float]
+# key -> (last payload, futures of every command it replaced)
+Group = Dict[Hashable, Tuple[Any, List[Optional[asyncio.Future]]]]
+
+# unload: seconds to finish the queued commands before the rest is dropped
+DRAIN_TIMEOUT = 30
+UNLOADED = {"success": False, "error": "Integration unloaded"}
+
+
+class CommandQueue:
+    """Bounded FIFO between the command listeners and the processor.
+
+    A single consumer applies commands one at a time, so commands for the same
+    entity keep their order and never interleave on the entity table or the store.
+    When full, `drop_oldest` discards the oldest waiting command and `reject`
+    refuses the new one.
+
+    With a coalesce window, consecutive commands that `key_fn` gives a key
+    (create/delete of one entity) and that are already waiting, queued within
+    `coalesce_window` seconds of the first, are applied together by
+    `process_many`, only the last command per key kept. Nothing waits for the
+    window: a lone command is applied at once, a storm coalesces what queues up
+    while the previous group is applied. Any other command ends the group, so
+    ordering against it is preserved.
+
+    `async_stop` processes what is already queued (up to DRAIN_TIMEOUT) and
+    refuses later commands. Every submitted command's future is resolved.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        process: Callable[[Any], Awaitable[dict]],
+        metrics: CommandMetrics,
+        maxsize: int = DEFAULT_QUEUE_SIZE,
+        overflow: str = DEFAULT_QUEUE_OVERFLOW,
+        key_fn: Optional[Callable[[Any], Tuple[Optional[Hashable], Any]]] = None,
+        process_many: Optional[Callable[[List[Any]], Awaitable[List[dict]]]] = None,
+        coalesce_window: float = DEFAULT_COALESCE_WINDOW,
+    ) -> None:
+        self.hass = hass
+        self._process = process
+        self._metrics = metrics
+        self._maxsize = maxsize
+        self._overflow = overflow
+        self._key_fn = key_fn
+        self._process_many = process_many
+        self._coalesce_window = coalesce_window if key_fn and process_many else 0
+        self._items: Deque[Item] = deque()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.max_depth = 0
+
+    @property
+    def depth(self) -> int:
+        return len(self._items)
+
+    @callback
+    def async_start(self) -> None:
+        """Start the consumer; after `async_stop` commands are accepted again."""
+        self._stopping = False
+        if self._task is None:
+            self._task = self.hass.async_create_background_task(
+                self._consume(), "hs_command_listener command queue"
+            )
+
+    @callback
+    def async_put(self, payload: Any, future: Optional[asyncio.Future] = None) -> bool:
+        """Queue a command; False if it was rejected (queue full or stopping)."""
+        if self._stopping:
+            _resolve(future, UNLOADED)
+            return False
+        if len(self._items) >= self._maxsize:
+            self._metrics.error(ERROR_QUEUE_OVERFLOW)
+            if self._overflow == OVERFLOW_REJECT:
+                _LOGGER.warning("Command queue full (%s), command rejected", self._maxsize)
+                _resolve(future, {"success": False, "error": "Command queue full"})
+                return False
+            _LOGGER.warning("Command queue full (%s), oldest command dropped", self._maxsize)
+            _, dropped, _ = self._items.popleft()
+            _resolve(dropped, {"success": False, "error": "Dropped, command queue full"})
+
+        self._items.append((payload, future, self.hass.loop.time()))
+        self.max_depth = max(self.max_depth, len(self._items))
+        self._wakeup.set()
+        return True
+
+    async def async_submit(self, payload: Any) -> dict:
+        """Queue a command and wait for its result."""
+        future = self.hass.loop.create_future()
+        self.async_put(payload, future)
+        return await future
+
+    async def _consume(self) -> None:
+        while True:
+            if not self._items:
+                if self._stopping:
+                    return
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            payload, future, queued = self._items.popleft()
+            if self._coalesce_window > 0:
+                key, payload = self._key_fn(payload)
+                if key is not None:
+                    await self._coalesce(key, payload, future, queued)
+                    continue
+
+            # cancelled mid-command (stop timed out): the caller still gets an answer
+            result = UNLOADED
+            try:
+                result = await self._process(payload)
+            except Exception as exc:  # keep the consumer alive
+                _LOGGER.exception("Error processing command: %s", payload)
+                result = {"success": False, "error": str(exc)}
+            finally:
+                _resolve(future, result)
+
+    async def _coalesce(self, key: Hashable, payload: Any, future: Optional[asyncio.Future], queued: float) -> None:
+        group: Group = {key: (payload, [future])}
+        try:
+            await self._apply_group(group, self._collect(group, queued + self._coalesce_window))
+        finally:
+            # cancelled before or while the group was applied
+            for _, futures in group.values():
+                for future in futures:
+                    _resolve(future, UNLOADED)
+
+    def _collect(self, group: Group, deadline: float) -> int:
+        """Move the waiting commands queued before `deadline` into `group`; how many were received."""
+        received = 1
+        while self._items:
+            payload, future, queued = self._items[0]
+            if queued > deadline:
+                break
+            key, payload = self._key_fn(payload)
+            if key is None:
+                # keep it decoded for when its turn comes
+                self._items[0] = (payload, future, queued)
+                break
+            self._items.popleft()
+            futures = group.pop(key, (None, []))[1]
+            # re-insert: the surviving command takes the position of the last one
+            group[key] = (payload, futures + [future])
+            received += 1
+        return received
+
+    async def _apply_group(self, group: Group, received: int) -> None:
+        self._metrics.coalesced += received - len(group)
+        payloads = [payload for payload, _ in group.values()]
+        try:
+            results = await self._process_many(payloads)
+        except Exception as exc:  # keep the consumer alive
+            _LOGGER.exception("Error processing commands: %s", payloads)
+            results = [{"success": False, "error": str(exc)}] * len(payloads)
+        for (_, futures), result in zip(group.values(), results):
+            for future in futures:
+                _resolve(future, result)
+
+    async def async_stop(self, timeout: float = DRAIN_TIMEOUT) -> None:
+        """Process the queued commands, then stop the consumer; later ones are refused.
+
+        Whatever is not done after `timeout` seconds is dropped and answered as unloaded.
+        """
+        self._stopping = True
+        if self._task is not None:
+            self._wakeup.set()
+            done, _ = await asyncio.wait([self._task], timeout=timeout)
+            if not done:
+                _LOGGER.warning("Command queue not drained in %s s, %s commands dropped", timeout, len(self._items))
+                self._task.cancel()
+                try:
+                    await self._task
+                except asyncio.CancelledError:
+                    pass
+            self._task = None
+        while self._items:
+            _, future, _ = self._items.popleft()
+            _resolve(future, UNLOADED)
+
+
+def _resolve(future: Optional[asyncio.Future], result: dict) -> None:
+    if future is not None and not future.done():
+        future.set_result(result)
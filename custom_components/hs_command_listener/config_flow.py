@@ -1,7 +1,99 @@
+import voluptuous as vol
 
 from homeassistant import config_entries
-from .const import DOMAIN
+from homeassistant.const import CONF_NAME
+from homeassistant.core import callback
+from homeassistant.util import slugify
+
+from .const import CONF_PREFIX, DOMAIN
+from .const import CONF_SAVE_DELAY, CONF_SAVE_MAX_DELAY, DEFAULT_SAVE_DELAY, DEFAULT_SAVE_MAX_DELAY
+from .const import CONF_ADD_ENTITIES_WINDOW, DEFAULT_ADD_ENTITIES_WINDOW
+from .const import CONF_QUEUE_SIZE, CONF_QUEUE_OVERFLOW, DEFAULT_QUEUE_SIZE, DEFAULT_QUEUE_OVERFLOW
+from .const import OVERFLOW_DROP_OLDEST, OVERFLOW_REJECT
+from .const import CONF_COALESCE_WINDOW, DEFAULT_COALESCE_WINDOW
+from .const import CONF_CHUNK_TIMEOUT, CONF_CHUNK_MAX_BYTES, DEFAULT_CHUNK_TIMEOUT, DEFAULT_CHUNK_MAX_BYTES
+from .const import CONF_JOURNAL_FLUSH_DELAY, DEFAULT_JOURNAL_FLUSH_DELAY
+from .entity_table import prefixes_overlap, shadowed_prefix
+
+DEFAULT_TITLE = "HS Command Listener"
+
+_SECONDS = vol.All(vol.Coerce(float), vol.Range(min=0))
+
+# option -> (default, validator); applied through a reload of the entry
+OPTIONS = {
+    CONF_SAVE_DELAY: (DEFAULT_SAVE_DELAY, _SECONDS),
+    CONF_SAVE_MAX_DELAY: (DEFAULT_SAVE_MAX_DELAY, _SECONDS),
+    CONF_ADD_ENTITIES_WINDOW: (DEFAULT_ADD_ENTITIES_WINDOW, _SECONDS),
+    CONF_QUEUE_SIZE: (DEFAULT_QUEUE_SIZE, vol.All(vol.Coerce(int), vol.Range(min=1))),
+    CONF_QUEUE_OVERFLOW: (DEFAULT_QUEUE_OVERFLOW, vol.In([OVERFLOW_DROP_OLDEST, OVERFLOW_REJECT])),
+    CONF_COALESCE_WINDOW: (DEFAULT_COALESCE_WINDOW, _SECONDS),
+    CONF_CHUNK_TIMEOUT: (DEFAULT_CHUNK_TIMEOUT, vol.All(vol.Coerce(float), vol.Range(min=1))),
+    CONF_CHUNK_MAX_BYTES: (DEFAULT_CHUNK_MAX_BYTES, vol.All(vol.Coerce(int), vol.Range(min=1024))),
+    CONF_JOURNAL_FLUSH_DELAY: (DEFAULT_JOURNAL_FLUSH_DELAY, _SECONDS),
+}
+
 
 class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     async def async_step_user(self, user_input=None):
-        return self.async_create_entry(title="HS Command Listener", data={})
+        """One entry per HomeSeer source; each further entry needs its own prefix."""
+        errors = {}
+        if user_input is not None:
+            prefix = user_input.get(CONF_PREFIX, "").strip()
+            prefixes = [entry.data.get(CONF_PREFIX, "") for entry in self._async_current_entries()]
+            if prefix and slugify(prefix) != prefix:
+                errors[CONF_PREFIX] = "invalid_prefix"
+            elif prefix in prefixes:
+                errors[CONF_PREFIX] = "prefix_in_use"
+            elif any(prefixes_overlap(prefix, other) for other in prefixes if other):
+                errors[CONF_PREFIX] = "prefix_overlaps"
+            elif prefix and self._shadows_entities(prefix):
+                errors[CONF_PREFIX] = "prefix_shadows_entities"
+            else:
+                return self.async_create_entry(title=user_input[CONF_NAME], data={CONF_PREFIX: prefix})
+
+        return self.async_show_form(
+            step_id="user",
+            data_schema=vol.Schema({
+                vol.Required(CONF_NAME, default=DEFAULT_TITLE): str,
+                vol.Optional(CONF_PREFIX, default=""): str,
+            }),
+            errors=errors,
+        )
+
+    def _shadows_entities(self, prefix: str) -> bool:
+        # "hs2_x" of the entry without a prefix would get the same ids as hs2's "x"
+        return any(
+            shadowed_prefix(record.entityID, processor.prefix, (prefix,)) is not None
+            for processor in self.hass.data.get(DOMAIN, {}).values()
+            for record in processor.entities
+        )
+
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry):
+        return OptionsFlowHandler(config_entry)
+
+
+class OptionsFlowHandler(config_entries.OptionsFlow):
+    """Tuning options of the command processor; saving them reloads the entry."""
+
+    def __init__(self, config_entry) -> None:
+        self._entry = config_entry
+
+    async def async_step_init(self, user_input=None):
+        errors = {}
+        if user_input is not None:
+            if user_input[CONF_SAVE_MAX_DELAY] < user_input[CONF_SAVE_DELAY]:
+                errors[CONF_SAVE_MAX_DELAY] = "max_delay_too_short"
+            else:
+                return self.async_create_entry(title="", data=user_input)
+
+        options = user_input or self._entry.options
+        return self.async_show_form(
+            step_id="init",
+            data_schema=vol.Schema({
+                vol.Optional(key, default=options.get(key, default)): validator
+                for key, (default, validator) in OPTIONS.items()
+            }),
+            errors=errors,
+        )
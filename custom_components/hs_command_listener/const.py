@@ -3,9 +3,22 @@ DOMAIN = "hs_command_listener"
 
 ENTITY_ID_COMMAND = "hs_command_input2"
 
+# Config entry namespace, one entry per HomeSeer source. The entry without a
+# prefix keeps the unprefixed ids and storage; with one, entity ids become
+# "<prefix>_<entityID>" and the input entity "hs_command_input2_<prefix>".
+# Service calls and command events pick their entry by the same key.
+CONF_PREFIX = "prefix"
+
+# Direct command ingress, bypassing the text entity
+SERVICE_EXECUTE = "execute"
+EVENT_COMMAND = f"{DOMAIN}_command"
+
 STR_TYPE = "type"
 STR_ENTITYID = "entityID"
 STR_NAME = "name"
+STR_ITEMS = "items"
+STR_HASH = "hash"
+STR_VALUES = "values"
 
 COMMAND_CREATE = "create"
 COMMAND_DELETE = "delete"
@@ -13,5 +26,78 @@ COMMAND_PURGE = "purge"
 COMMAND_DEBUG = "debug"
 COMMAND_ENABLE = "enable"
 COMMAND_DISABLE = "disable"
+COMMAND_STATS = "stats"
+COMMAND_BATCH = "batch"
+COMMAND_RECONCILE = "reconcile"
+COMMAND_SET = "set"
+
+# Always set up: the command input entity and the diagnostic sensors. The entity
+# type platforms (ENTITY_TYPE_PLATFORMS) are set up when the first entity needs one
+BASE_PLATFORMS = ["text", "sensor"]
+
+# Entity creates arriving within this window (seconds) are added to the platform
+# in one async_add_entities call; 0 coalesces within the current event-loop tick
+CONF_ADD_ENTITIES_WINDOW = "add_entities_window"
+DEFAULT_ADD_ENTITIES_WINDOW = 0
+
+# Defaults of the dynamic entities for create fields left out
+DEFAULT_NUMBER_MIN = 0
+DEFAULT_NUMBER_MAX = 100
+DEFAULT_NUMBER_STEP = 1
+DEFAULT_SELECT_OPTIONS = ("Option 1", "Option 2")
+DEFAULT_TEXT_MAX = 255
+# string values a switch takes from the set command
+SWITCH_STATES = {"on": True, "true": True, "off": False, "false": False}
+
+# A dispatched entity not added to HA within this many seconds (failed or skipped
+# platform add) is dispatched again by a repeated, unchanged create
+ADD_PENDING_TIMEOUT = 30
+
+# Create signal per config entry and entity type, only the owning platform of that
+# entry listens: .format(entry_id, "TOGGLE")
+SIGNAL_CREATE_ENTITY = DOMAIN + "_create_entity_{}_{}"
+
+# Command entity type -> HA platform (entity_id domain)
+ENTITY_TYPE_PLATFORMS = {
+    "TOGGLE": "switch",
+    "NUMBER": "number",
+    "SELECT": "select",
+    "TEXT": "text",
+    "BUTTON": "button",
+}
+
+# Value storage writes are coalesced: written SAVE_DELAY seconds after the last
+# change, but never later than SAVE_MAX_DELAY seconds after the first unsaved one
+CONF_SAVE_DELAY = "save_delay"
+CONF_SAVE_MAX_DELAY = "save_max_delay"
+DEFAULT_SAVE_DELAY = 2
+DEFAULT_SAVE_MAX_DELAY = 10
+
+# Commands wait in a bounded queue and are processed one at a time, in order
+CONF_QUEUE_SIZE = "queue_size"
+CONF_QUEUE_OVERFLOW = "queue_overflow"
+DEFAULT_QUEUE_SIZE = 1000
+OVERFLOW_DROP_OLDEST = "drop_oldest"
+OVERFLOW_REJECT = "reject"
+DEFAULT_QUEUE_OVERFLOW = OVERFLOW_DROP_OLDEST
+
+# Waiting create/delete commands for the same entity, queued within this window
+# (seconds) of the first, are collapsed to the last one and applied as one batch.
+# Nothing waits for the window; 0 disables
+CONF_COALESCE_WINDOW = "coalesce_window"
+DEFAULT_COALESCE_WINDOW = 0.2
+
+# Commands longer than the input entity's state are sent as frames (framing.py). An
+# incomplete message is dropped CHUNK_TIMEOUT seconds after its last frame, and the
+# oldest ones while more than CHUNK_MAX_BYTES of frames are waiting
+CONF_CHUNK_TIMEOUT = "chunk_timeout"
+CONF_CHUNK_MAX_BYTES = "chunk_max_bytes"
+DEFAULT_CHUNK_TIMEOUT = 30
+DEFAULT_CHUNK_MAX_BYTES = 1024 * 1024
 
-PLATFORMS = ["switch", "number", "button", "select", "text"]
+# Entity changes are appended to a journal, written (one fsync) JOURNAL_FLUSH_DELAY
+# seconds after the first unwritten one. It is compacted into the entity snapshot
+# once it has more entries than the table, and at least JOURNAL_COMPACT_MIN
+CONF_JOURNAL_FLUSH_DELAY = "journal_flush_delay"
+DEFAULT_JOURNAL_FLUSH_DELAY = 0.5
+JOURNAL_COMPACT_MIN = 1000
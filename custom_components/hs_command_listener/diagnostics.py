@@ -0,0 +1,25 @@
+from typing import Any
+
+from homeassistant.core import HomeAssistant
+from homeassistant.config_entries import ConfigEntry
+
+from .const import DOMAIN
+
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry) -> dict[str, Any]:
+    """Command processor metrics for the diagnostics download."""
+    processor = hass.data[DOMAIN][entry.entry_id]
+    return {
+        "prefix": processor.prefix,
+        "options": dict(entry.options),
+        "entities": len(processor.entities),
+        "journal_entries": processor.journal.entries,
+        "stored_values": len(processor.values),
+        "platforms": sorted(processor.platforms),
+        "events_delivered": processor.events_delivered,
+        "events_processed": processor.events_processed,
+        "queue_depth": processor.queue.depth,
+        "queue_max_depth": processor.queue.max_depth,
+        "chunks": processor.chunks.as_dict(),
+        "metrics": processor.metrics.as_dict(),
+    }
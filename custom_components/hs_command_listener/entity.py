@@ -0,0 +1,172 @@
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Optional, TypeVar
+
+from homeassistant.core import callback
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.entity import Entity
+from homeassistant.helpers.event import async_call_later
+
+from .command import Command
+from .const import DOMAIN
+from .metrics import STAGE_ADD_ENTITIES
+
+_LOGGER = logging.getLogger(__name__)
+
+@dataclass(frozen=True, slots=True)
+class WritePolicy:
+    """Opt-in limits on the state writes of value changes, from the create command.
+
+    dedupe: skip writing an unchanged value. max_rate: at most that many writes
+    per second, the last value is written when the interval is over. deadband:
+    skip number changes smaller than this from the last written value.
+    """
+
+    dedupe: bool = False
+    max_rate: Optional[float] = None
+    deadband: Optional[float] = None
+
+    @classmethod
+    def from_command(cls, command: Command) -> Optional["WritePolicy"]:
+        if not (command.dedupe or command.max_rate or command.deadband):
+            return None
+        return cls(bool(command.dedupe), command.max_rate, command.deadband)
+
+    def should_write(self, value: Any, written: Any) -> bool:
+        """False if `value` need not replace the last written value."""
+        if self.dedupe and value == written:
+            return False
+        if self.deadband and _is_number(value) and _is_number(written):
+            return abs(value - written) >= self.deadband
+        return True
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+_EntityT = TypeVar("_EntityT", bound="DynamicEntity")
+
+
+def with_write_policy(entity: _EntityT, command: Command) -> _EntityT:
+    """Set the entity's write policy from its create command (platform create handlers)."""
+    entity.write_policy = WritePolicy.from_command(command)
+    return entity
+
+
+class DynamicEntity(Entity):
+    """Common base of the entities created by the create command."""
+
+    # set by BulkEntityAdder when handed to async_add_entities (registry add latency)
+    add_requested_at: Optional[float] = None
+
+    write_policy: Optional[WritePolicy] = None
+    # value and loop time of the last state write, and a throttled write waiting
+    _written_value: Any = None
+    _written_at: float = 0.0
+    _cancel_write: Optional[Callable[[], None]] = None
+    # CommandProcessor of the entity's config entry, set when added
+    _processor: Any = None
+
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+
+        processor = self.hass.data[DOMAIN].get(self.platform.config_entry.entry_id)
+        if processor is None:
+            return
+        self._processor = processor
+        processor.live[self.unique_id] = self
+        processor.adding.pop(self.unique_id, None)
+        value = processor.values.get(self.unique_id)
+        if value is not None:
+            self._restore_value(value)
+
+        if self.add_requested_at is not None:
+            processor.metrics.record(STAGE_ADD_ENTITIES, time.perf_counter() - self.add_requested_at)
+            self.add_requested_at = None
+
+        # deleted while the platform add was still in flight: don't leave it behind
+        if processor.entities.get_by_unique_id(self.unique_id) is None:
+            _LOGGER.debug("%s was deleted before it was added, removing", self.entity_id)
+            self.hass.async_create_task(self._async_remove_deleted())
+
+    async def _async_remove_deleted(self) -> None:
+        if self.registry_entry is not None:
+            # the registry removes the entity from the platform and the state machine
+            er.async_get(self.hass).async_remove(self.entity_id)
+        else:
+            await self.async_remove()
+
+    async def async_will_remove_from_hass(self) -> None:
+        if self._cancel_write is not None:
+            self._cancel_write()
+            self._cancel_write = None
+        if self._processor is not None and self._processor.live.get(self.unique_id) is self:
+            del self._processor.live[self.unique_id]
+        await super().async_will_remove_from_hass()
+
+    @callback
+    def async_update_from_command(self, name: str, command: Command) -> None:
+        """Apply a changed create command in place instead of re-adding the entity."""
+        self._attr_name = name
+        self.write_policy = WritePolicy.from_command(command)
+        self._apply_command(command)
+        _LOGGER.debug("Updated %s in place", self.entity_id)
+        self.async_write_ha_state()
+
+    def _apply_command(self, command: Command) -> None:
+        """Copy type specific attributes (min/max, options...) from the command."""
+
+    @callback
+    def async_set_from_command(self, value: Any) -> None:
+        """Set the value carried by a set command; ValueError if the entity can't take it."""
+        self._set_value(value)
+        self.async_write_value()
+
+    def _set_value(self, value: Any) -> None:
+        """Validate and take a value from a set command (before it is written)."""
+        raise ValueError(f"{self.entity_id} has no value to set")
+
+    @callback
+    def async_write_value(self) -> None:
+        """Write the state after a value change and keep the value for the next start."""
+        value = self._stored_value()
+        if self._processor is not None:
+            self._processor.async_value_changed(self.unique_id, value)
+
+        policy = self.write_policy
+        if policy is None:
+            self.async_write_ha_state()
+            return
+        if self._cancel_write is not None:
+            # a throttled write is due, it writes whatever the value is by then
+            return
+        if not policy.should_write(value, self._written_value):
+            return
+        if policy.max_rate:
+            wait = self._written_at + 1 / policy.max_rate - self.hass.loop.time()
+            if wait > 0:
+                self._cancel_write = async_call_later(self.hass, wait, self._async_write_throttled)
+                return
+        self.async_write_ha_state()
+
+    @callback
+    def _async_write_throttled(self, _now) -> None:
+        self._cancel_write = None
+        if self.write_policy is None or self.write_policy.should_write(self._stored_value(), self._written_value):
+            self.async_write_ha_state()
+
+    @callback
+    def async_write_ha_state(self) -> None:
+        # every write, including HA's first one and attribute updates, is the new reference
+        self._written_value = self._stored_value()
+        self._written_at = self.hass.loop.time()
+        super().async_write_ha_state()
+
+    def _stored_value(self) -> Any:
+        """The entity's value as stored in the values store (JSON); None if it has none."""
+        return None
+
+    def _restore_value(self, value: Any) -> None:
+        """Take the value _stored_value returned before the restart."""
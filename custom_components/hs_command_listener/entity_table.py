@@ -0,0 +1,242 @@
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .command import Command
+from .const import COMMAND_CREATE, ENTITY_TYPE_PLATFORMS, STR_ENTITYID, STR_NAME, STR_TYPE
+from .const import DEFAULT_NUMBER_MAX, DEFAULT_NUMBER_MIN, DEFAULT_SELECT_OPTIONS, DEFAULT_TEXT_MAX, SWITCH_STATES
+
+Key = Tuple[str, str]
+
+# Command attributes kept in the stored record (only when set)
+RECORD_ATTRS = ("min", "max", "step", "selects", "pattern", "dedupe", "max_rate", "deadband")
+
+
+def entity_key(etype: str, entity_id: str) -> Key:
+    return (etype.upper(), entity_id)
+
+
+def object_id(entity_id: str, prefix: str = "") -> str:
+    # entity ids of a config entry with a prefix are namespaced: "hs2_homeseer_713"
+    return f"{prefix}_{entity_id}" if prefix else entity_id
+
+
+def shadowed_prefix(entity_id: str, prefix: str, prefixes: Iterable[str]) -> Optional[str]:
+    """The longer prefix among `prefixes` whose ids the entity of `entity_id` would take.
+
+    "hs2_x" of the entry without a prefix would share the ids of hs2's "x", and "a_x"
+    of hs2 those of hs2_a's "x"; the entry with the longest matching prefix owns them.
+    """
+    name = object_id(entity_id, prefix)
+    return next((other for other in prefixes if len(other) > len(prefix) and name.startswith(f"{other}_")), None)
+
+
+def prefixes_overlap(first: str, second: str) -> bool:
+    # "hs2" and "hs2_a": hs2's "a_x" and hs2_a's "x" are both hs2_a_x
+    return first.startswith(f"{second}_") or second.startswith(f"{first}_")
+
+
+def unique_id_for(etype: str, entity_id: str) -> str:
+    # matches _attr_unique_id of the Dynamic* entities, e.g. "toggle_homeseer_713"
+    return f"{etype.lower()}_{entity_id}"
+
+
+def full_entity_id(etype: str, entity_id: str) -> str:
+    # e.g. "switch.homeseer_713" for a TOGGLE
+    platform = ENTITY_TYPE_PLATFORMS.get(etype.upper(), etype.lower())
+    return f"{platform}.{entity_id}"
+
+
+@dataclass(frozen=True, slots=True)
+class EntityRecord:
+    """One stored entity; as_dict() is the JSON EntityStore writes."""
+
+    type: str
+    entityID: str
+    name: str
+    min: Optional[float] = None
+    max: Optional[float] = None
+    step: Optional[float] = None
+    selects: Optional[Tuple[str, ...]] = None
+    pattern: Optional[str] = None
+    dedupe: Optional[bool] = None
+    max_rate: Optional[float] = None
+    deadband: Optional[float] = None
+
+    @property
+    def key(self) -> Key:
+        return (self.type, self.entityID)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "EntityRecord":
+        selects = data.get("selects")
+        return cls(
+            data[STR_TYPE].upper(),
+            data[STR_ENTITYID],
+            data.get(STR_NAME) or data[STR_ENTITYID],
+            data.get("min"),
+            data.get("max"),
+            data.get("step"),
+            tuple(selects) if selects is not None else None,
+            data.get("pattern"),
+            data.get("dedupe"),
+            data.get("max_rate"),
+            data.get("deadband"),
+        )
+
+    def as_dict(self) -> Dict[str, Any]:
+        data = {STR_TYPE: self.type, STR_ENTITYID: self.entityID, STR_NAME: self.name}
+        for attr in RECORD_ATTRS:
+            value = getattr(self, attr)
+            if value is not None:
+                data[attr] = list(value) if attr == "selects" else value
+        return data
+
+
+def record_from_command(cmd: Command) -> EntityRecord:
+    return EntityRecord(
+        cmd.type.upper(),
+        cmd.entityID,
+        cmd.name,
+        cmd.min,
+        cmd.max,
+        cmd.step,
+        tuple(cmd.selects) if cmd.selects is not None else None,
+        cmd.pattern,
+        cmd.dedupe,
+        cmd.max_rate,
+        cmd.deadband,
+    )
+
+
+def record_value(record: EntityRecord, value: Any) -> Any:
+    """`value` as the record's entity takes it from a set command; ValueError if it can't.
+
+    For entities not added yet, the same checks the live entities' _set_value make.
+    """
+    if record.type == "TOGGLE":
+        if isinstance(value, str) and value.lower() in SWITCH_STATES:
+            return SWITCH_STATES[value.lower()]
+        if isinstance(value, (bool, int, float)):
+            return bool(value)
+        raise ValueError(f"expected on/off, got {value!r}")
+    if record.type == "NUMBER":
+        if not isinstance(value, (int, float)) or isinstance(value, bool):
+            raise ValueError(f"expected a number, got {value!r}")
+        low = DEFAULT_NUMBER_MIN if record.min is None else record.min
+        high = DEFAULT_NUMBER_MAX if record.max is None else record.max
+        if not low <= value <= high:
+            raise ValueError(f"{value} is outside {low}..{high}")
+        return value
+    if record.type == "SELECT":
+        if value not in (record.selects or DEFAULT_SELECT_OPTIONS):
+            raise ValueError(f"{value!r} is not one of the options")
+        return value
+    if record.type == "TEXT":
+        if not isinstance(value, str):
+            raise ValueError(f"expected a string, got {value!r}")
+        low = 0 if record.min is None else int(record.min)
+        high = DEFAULT_TEXT_MAX if record.max is None else int(record.max)
+        if not low <= len(value) <= high:
+            raise ValueError(f"length {len(value)} is outside {low}..{high}")
+        if record.pattern and not re.fullmatch(record.pattern, value):
+            raise ValueError(f"{value!r} does not match {record.pattern}")
+        return value
+    raise ValueError(f"{record.type} has no value to set")
+
+
+def command_from_record(record: EntityRecord) -> Command:
+    """The CREATE command that (re)creates a stored entity."""
+    return Command(
+        command=COMMAND_CREATE,
+        type=record.type,
+        name=record.name,
+        entityID=record.entityID,
+        force=False,
+        min=record.min,
+        max=record.max,
+        step=record.step,
+        selects=list(record.selects) if record.selects is not None else None,
+        pattern=record.pattern,
+        dedupe=record.dedupe,
+        max_rate=record.max_rate,
+        deadband=record.deadband,
+    )
+
+
+class EntityTable:
+    """Stored entity records keyed by (type, entityID).
+
+    Secondary indexes by unique_id and full entity_id keep every lookup O(1).
+    Built from / serialised to the list of dicts EntityStore persists:
+    {"type", "entityID", "name"} plus min/max/step/selects/pattern when set.
+    Records keep the entityID as sent; `prefix` namespaces the HA ids.
+    """
+
+    def __init__(self, records: Optional[List[dict]] = None, prefix: str = "") -> None:
+        self.prefix = prefix
+        self._by_key: Dict[Key, EntityRecord] = {}
+        self._by_unique_id: Dict[str, Key] = {}
+        self._by_entity_id: Dict[str, Key] = {}
+        for record in records or []:
+            self.add(EntityRecord.from_dict(record))
+
+    def add(self, record: EntityRecord) -> Optional[EntityRecord]:
+        """Insert or replace a record, return the one it replaced."""
+        etype, entity_id = record.type, record.entityID
+        key = record.key
+        previous = self._by_key.pop(key, None)
+        # re-insert so the table keeps the order records were (re)created in
+        self._by_key[key] = record
+        self._by_unique_id[self.unique_id(etype, entity_id)] = key
+        self._by_entity_id[self.entity_id(etype, entity_id)] = key
+        return previous
+
+    def remove(self, etype: str, entity_id: str) -> Optional[EntityRecord]:
+        record = self._by_key.pop(entity_key(etype, entity_id), None)
+        if record is not None:
+            self._by_unique_id.pop(self.unique_id(etype, entity_id), None)
+            self._by_entity_id.pop(self.entity_id(etype, entity_id), None)
+        return record
+
+    def object_id(self, entity_id: str) -> str:
+        """The object id the entity is created with, e.g. "hs2_homeseer_713"."""
+        return object_id(entity_id, self.prefix)
+
+    def unique_id(self, etype: str, entity_id: str) -> str:
+        return unique_id_for(etype, object_id(entity_id, self.prefix))
+
+    def entity_id(self, etype: str, entity_id: str) -> str:
+        return full_entity_id(etype, object_id(entity_id, self.prefix))
+
+    def get(self, etype: str, entity_id: str) -> Optional[EntityRecord]:
+        return self._by_key.get(entity_key(etype, entity_id))
+
+    def get_by_unique_id(self, unique_id: str) -> Optional[EntityRecord]:
+        key = self._by_unique_id.get(unique_id)
+        return self._by_key.get(key) if key else None
+
+    def get_by_entity_id(self, entity_id: str) -> Optional[EntityRecord]:
+        key = self._by_entity_id.get(entity_id)
+        return self._by_key.get(key) if key else None
+
+    def clear(self) -> None:
+        self._by_key.clear()
+        self._by_unique_id.clear()
+        self._by_entity_id.clear()
+
+    def as_list(self) -> List[dict]:
+        """The JSON shape EntityStore writes: a list of record dicts."""
+        return [record.as_dict() for record in self._by_key.values()]
+
+    def __contains__(self, key: Key) -> bool:
+        return entity_key(*key) in self._by_key
+
+    def __iter__(self) -> Iterator[EntityRecord]:
+        return iter(self._by_key.values())
+
+    def __len__(self) -> int:
+        return len(self._by_key)
+
+    def __repr__(self) -> str:
+        return f"EntityTable({self.as_list()!r})"
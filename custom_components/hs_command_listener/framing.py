@@ -0,0 +1,192 @@
+import base64
+import binascii
+import re
+import time
+import zlib
+from typing import Callable, Dict, List, Optional
+
+from .command import CommandError
+from .const import DEFAULT_CHUNK_MAX_BYTES, DEFAULT_CHUNK_TIMEOUT
+from .metrics import ERROR_CHUNK_OVERFLOW, ERROR_CHUNK_TIMEOUT, ERROR_INVALID_CHUNK
+
+# A command too long for one state of the input entity (255 characters) is sent as
+# frames, one state write each:
+#
+#   #<id>:<index>:<total>:<encoding>:<data>
+#
+# id: up to 16 of [A-Za-z0-9_-], the same for every frame of a message
+# index: 0 .. total - 1, frames may arrive in any order
+# encoding: empty for plain text, "z" for zlib + base64 of the UTF-8 text
+# data: the slice of the (encoded) message carried by this frame
+#
+# Commands are JSON and start with "{" or "[", never with CHUNK_MARKER.
+CHUNK_MARKER = "#"
+ENCODING_PLAIN = ""
+ENCODING_ZLIB = "z"
+MAX_CHUNKS = 4096
+STATE_MAX_LENGTH = 255
+
+_MESSAGE_ID = re.compile(r"[A-Za-z0-9_-]{1,16}")
+
+
+def is_chunk(payload: str) -> bool:
+    return payload.startswith(CHUNK_MARKER)
+
+
+def encode_chunks(
+    message: str, message_id: str, encoding: str = ENCODING_PLAIN, max_length: int = STATE_MAX_LENGTH
+) -> List[str]:
+    """Frames of `message`, none longer than `max_length` (the sender side, for tools and tests)."""
+    if not _MESSAGE_ID.fullmatch(message_id):
+        raise ValueError(f"Invalid message id: {message_id!r}")
+    if encoding == ENCODING_ZLIB:
+        message = base64.b64encode(zlib.compress(message.encode(), 9)).decode("ascii")
+    elif encoding != ENCODING_PLAIN:
+        raise ValueError(f"Unknown encoding: {encoding!r}")
+
+    # the header grows with the digits of total; size for the largest possible one
+    size = max_length - len(f"{CHUNK_MARKER}{message_id}:{MAX_CHUNKS}:{MAX_CHUNKS}:{encoding}:")
+    slices = [message[i:i + size] for i in range(0, len(message), size)] or [""]
+    if len(slices) > MAX_CHUNKS:
+        raise ValueError(f"Message needs {len(slices)} frames, at most {MAX_CHUNKS} are allowed")
+    return [
+        f"{CHUNK_MARKER}{message_id}:{index}:{len(slices)}:{encoding}:{data}"
+        for index, data in enumerate(slices)
+    ]
+
+
+class _Message:
+    __slots__ = ("total", "encoding", "parts", "size", "updated")
+
+    def __init__(self, total: int, encoding: str, now: float) -> None:
+        self.total = total
+        self.encoding = encoding
+        self.parts: Dict[int, str] = {}
+        self.size = 0
+        self.updated = now
+
+
+class ChunkAssembler:
+    """Reassembles framed commands arriving through the command input entity.
+
+    The buffer is bounded: a message whose last frame is older than `timeout`
+    seconds is dropped when the next frame arrives, and while the buffered frames exceed `max_bytes` the
+    oldest incomplete messages are dropped; `on_error(kind, message)` is told of
+    each. A complete message is returned by `feed` as the command text and
+    leaves the buffer.
+    """
+
+    def __init__(
+        self,
+        timeout: float = DEFAULT_CHUNK_TIMEOUT,
+        max_bytes: int = DEFAULT_CHUNK_MAX_BYTES,
+        on_error: Optional[Callable[[str, str], None]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._timeout = timeout
+        self._max_bytes = max_bytes
+        self._on_error = on_error
+        self._clock = clock
+        # insertion order is arrival order of each message's first frame
+        self._messages: Dict[str, _Message] = {}
+        self._size = 0
+        self.completed = 0
+        self.dropped = 0
+
+    @property
+    def pending(self) -> int:
+        return len(self._messages)
+
+    def feed(self, frame: str) -> Optional[str]:
+        """Add one frame; the command text once the message is complete, else None.
+
+        Raises CommandError for a malformed frame or a message that cannot be decoded.
+        """
+        now = self._clock()
+        self._expire(now)
+
+        try:
+            message_id, index, total, encoding, data = frame[len(CHUNK_MARKER):].split(":", 4)
+            index, total = int(index), int(total)
+        except ValueError:
+            raise CommandError(f"Invalid chunk frame: {frame[:40]!r}", ERROR_INVALID_CHUNK) from None
+        if not _MESSAGE_ID.fullmatch(message_id):
+            raise CommandError(f"Invalid chunk message id: {message_id!r}", ERROR_INVALID_CHUNK)
+        if not 0 < total <= MAX_CHUNKS or not 0 <= index < total:
+            raise CommandError(f"Chunk {index} of {total} is out of range ({message_id})", ERROR_INVALID_CHUNK)
+        if encoding not in (ENCODING_PLAIN, ENCODING_ZLIB):
+            raise CommandError(f"Unknown chunk encoding {encoding!r} ({message_id})", ERROR_INVALID_CHUNK)
+
+        message = self._messages.get(message_id)
+        if message is not None and (message.total != total or message.encoding != encoding):
+            # the id was reused for a new message before the old one completed
+            self._drop(message_id, ERROR_INVALID_CHUNK)
+            message = None
+        if message is None:
+            message = self._messages[message_id] = _Message(total, encoding, now)
+
+        # a repeated frame replaces the earlier copy
+        previous = message.parts.get(index)
+        message.parts[index] = data
+        growth = len(data) - (len(previous) if previous is not None else 0)
+        message.size += growth
+        self._size += growth
+        message.updated = now
+
+        if len(message.parts) == message.total:
+            self._remove(message_id)
+            self.completed += 1
+            return self._decode(message_id, message)
+
+        while self._size > self._max_bytes and self._messages:
+            oldest = next(iter(self._messages))
+            self._drop(oldest, ERROR_CHUNK_OVERFLOW)
+        return None
+
+    def clear(self) -> None:
+        self._messages.clear()
+        self._size = 0
+
+    def as_dict(self) -> dict:
+        return {
+            "pending": self.pending,
+            "buffered_bytes": self._size,
+            "completed": self.completed,
+            "dropped": self.dropped,
+        }
+
+    def _decode(self, message_id: str, message: _Message) -> str:
+        text = "".join(message.parts[i] for i in range(message.total))
+        if message.encoding == ENCODING_PLAIN:
+            return text
+        try:
+            decompressor = zlib.decompressobj()
+            # bounded like the buffer, a small frame set must not inflate without limit
+            raw = decompressor.decompress(base64.b64decode(text, validate=True), self._max_bytes)
+            if decompressor.unconsumed_tail:
+                raise CommandError(
+                    f"Chunked message {message_id} is larger than {self._max_bytes} bytes", ERROR_INVALID_CHUNK
+                )
+            return raw.decode()
+        except (binascii.Error, zlib.error, UnicodeDecodeError) as exc:
+            raise CommandError(f"Chunked message {message_id} cannot be decoded: {exc}", ERROR_INVALID_CHUNK) from None
+
+    def _expire(self, now: float) -> None:
+        for message_id in [
+            message_id for message_id, message in self._messages.items()
+            if now - message.updated > self._timeout
+        ]:
+            self._drop(message_id, ERROR_CHUNK_TIMEOUT)
+
+    def _drop(self, message_id: str, kind: str) -> None:
+        message = self._remove(message_id)
+        self.dropped += 1
+        if self._on_error is not None:
+            self._on_error(
+                kind, f"Chunked message {message_id} dropped, {len(message.parts)} of {message.total} frames received"
+            )
+
+    def _remove(self, message_id: str) -> _Message:
+        message = self._messages.pop(message_id)
+        self._size -= message.size
+        return message
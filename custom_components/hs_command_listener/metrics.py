@@ -0,0 +1,100 @@
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Iterator
+
+# Timed stages of a command
+STAGE_PARSE = "parse"
+STAGE_APPLY = "apply"
+STAGE_DISPATCH = "dispatch"
+STAGE_ADD_ENTITIES = "add_entities"
+STAGE_SAVE = "save"
+STAGE_JOURNAL = "journal"
+STAGE_TOTAL = "total"
+STAGES = (STAGE_PARSE, STAGE_APPLY, STAGE_DISPATCH, STAGE_ADD_ENTITIES, STAGE_SAVE, STAGE_JOURNAL, STAGE_TOTAL)
+
+# Error kinds
+ERROR_INVALID_JSON = "invalid_json"
+ERROR_INVALID_COMMAND = "invalid_command"
+ERROR_UNSUPPORTED_COMMAND = "unsupported_command"
+ERROR_UNSUPPORTED_TYPE = "unsupported_type"
+ERROR_MISSING_TYPE = "missing_type"
+ERROR_QUEUE_OVERFLOW = "queue_overflow"
+ERROR_INVALID_CHUNK = "invalid_chunk"
+ERROR_CHUNK_TIMEOUT = "chunk_timeout"
+ERROR_CHUNK_OVERFLOW = "chunk_overflow"
+
+DEFAULT_SAMPLES = 512
+RATE_WINDOW = 60  # seconds
+
+
+class CommandMetrics:
+    """Per-stage timings, throughput and error counts of the command processor.
+
+    Samples are kept in bounded ring buffers; percentiles are computed only when read.
+    """
+
+    def __init__(self, samples: int = DEFAULT_SAMPLES) -> None:
+        self._timings: Dict[str, Deque[float]] = {stage: deque(maxlen=samples) for stage in STAGES}
+        self._command_times: Deque[float] = deque(maxlen=samples)
+        self.commands = 0
+        self.errors: Counter = Counter()
+        self.store_writes = 0
+        # batched appends (one fsync each) to the entity journal
+        self.journal_writes = 0
+        # commands superseded by a later one for the same entity (coalescing)
+        self.coalesced = 0
+
+    @contextmanager
+    def time(self, stage: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._timings[stage].append(time.perf_counter() - start)
+
+    def record(self, stage: str, seconds: float) -> None:
+        self._timings[stage].append(seconds)
+
+    def command(self, count: int = 1) -> None:
+        self.commands += count
+        now = time.monotonic()
+        self._command_times.extend([now] * min(count, self._command_times.maxlen))
+
+    def error(self, kind: str) -> None:
+        self.errors[kind] += 1
+
+    def commands_per_second(self) -> float:
+        now = time.monotonic()
+        recent = [t for t in self._command_times if now - t <= RATE_WINDOW]
+        if not recent:
+            return 0.0
+        # a full ring buffer covers less than the window
+        span = RATE_WINDOW if len(recent) < self._command_times.maxlen else max(now - recent[0], 1e-3)
+        return round(len(recent) / span, 2)
+
+    def percentiles(self, stage: str) -> dict:
+        """p50/p95/p99/max of a stage in milliseconds."""
+        samples = sorted(self._timings[stage])
+        if not samples:
+            return {"count": 0}
+        last = len(samples) - 1
+        pick = lambda q: round(samples[min(last, int(q * len(samples)))] * 1000, 3)
+        return {
+            "count": len(samples),
+            "p50": pick(0.50),
+            "p95": pick(0.95),
+            "p99": pick(0.99),
+            "max": round(samples[last] * 1000, 3),
+        }
+
+    def as_dict(self) -> dict:
+        return {
+            "commands": self.commands,
+            "commands_per_second": self.commands_per_second(),
+            "errors": dict(self.errors),
+            "store_writes": self.store_writes,
+            "journal_writes": self.journal_writes,
+            "coalesced": self.coalesced,
+            "timings_ms": {stage: self.percentiles(stage) for stage in STAGES},
+        }
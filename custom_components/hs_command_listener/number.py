@@ -3,44 +3,66 @@ import logging
 from homeassistant.core import HomeAssistant
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from homeassistant.helpers.dispatcher import async_dispatcher_connect
 
 from homeassistant.components.number import NumberEntity
-from .const import DOMAIN
+from .bulk_add import async_setup_dynamic_entities
+from .entity import DynamicEntity, with_write_policy
+from .const import DEFAULT_NUMBER_MIN, DEFAULT_NUMBER_MAX, DEFAULT_NUMBER_STEP
 
 _LOGGER = logging.getLogger(__name__)
 
-class DynamicNumber(NumberEntity):
+class DynamicNumber(DynamicEntity, NumberEntity):
     def __init__(self, entity_id, name, min_v, max_v, step):
         self.entity_id = f"number.{entity_id}"
         self._attr_unique_id = f"number_{entity_id}"
         self._attr_name = name
-        self._attr_native_value = min_v
-        self._attr_native_min_value = min_v
-        self._attr_native_max_value = max_v
-        self._attr_native_step = step
+        self._attr_native_min_value = DEFAULT_NUMBER_MIN if min_v is None else min_v
+        self._attr_native_max_value = DEFAULT_NUMBER_MAX if max_v is None else max_v
+        self._attr_native_step = DEFAULT_NUMBER_STEP if step is None else step
+        self._attr_native_value = self._attr_native_min_value
         self._attr_should_poll = False
 
-    async def async_set_native_value(self, value):
-        self._attr_native_value = value
-        self.async_write_ha_state()
+    def _apply_command(self, command):
+        # omitted fields go back to the defaults, as the stored record has them
+        self._attr_native_min_value = DEFAULT_NUMBER_MIN if command.min is None else command.min
+        self._attr_native_max_value = DEFAULT_NUMBER_MAX if command.max is None else command.max
+        self._attr_native_step = DEFAULT_NUMBER_STEP if command.step is None else command.step
+        # keep the value inside the new range
+        if self._attr_native_value is not None:
+            self._attr_native_value = min(
+                max(self._attr_native_value, self._attr_native_min_value),
+                self._attr_native_max_value,
+            )
 
+    def _stored_value(self):
+        return self._attr_native_value
 
-async def async_setup_entry(hass, config_entry, async_add_entities):
-
-    async def _handler(entity_type, entity_id, name, command):
-        if entity_type != "NUMBER":
-            return
+    def _set_value(self, value):
+        if not isinstance(value, (int, float)) or isinstance(value, bool):
+            raise ValueError(f"{self.entity_id}: expected a number, got {value!r}")
+        if not self._attr_native_min_value <= value <= self._attr_native_max_value:
+            raise ValueError(
+                f"{self.entity_id}: {value} is outside "
+                f"{self._attr_native_min_value}..{self._attr_native_max_value}"
+            )
+        self._attr_native_value = value
 
-        entity = DynamicNumber(
-            entity_id, name,
-            getattr(command, "min", 0),
-            getattr(command, "max", 100),
-            getattr(command, "step", 1)
-        )
+    def _restore_value(self, value):
+        if isinstance(value, (int, float)):
+            self._attr_native_value = min(max(value, self._attr_native_min_value), self._attr_native_max_value)
 
-        async_add_entities([entity])          # ← just call, no await / no task
-        #hass.async_create_task(async_add_entities([entity]))
+    async def async_set_native_value(self, value):
+        self._attr_native_value = value
+        self.async_write_value()
 
 
-    async_dispatcher_connect(hass, f"{DOMAIN}_create_entity", _handler)
+async def async_setup_entry(hass, config_entry, async_add_entities):
+    async_setup_dynamic_entities(
+        hass, config_entry, async_add_entities, "NUMBER",
+        lambda entity_id, name, command: with_write_policy(DynamicNumber(
+            entity_id, name,
+            getattr(command, "min", DEFAULT_NUMBER_MIN),
+            getattr(command, "max", DEFAULT_NUMBER_MAX),
+            getattr(command, "step", DEFAULT_NUMBER_STEP)
+        ), command),
+    )
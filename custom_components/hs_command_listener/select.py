@@ -4,16 +4,17 @@ from typing import List, Optional
 from homeassistant.core import HomeAssistant
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from homeassistant.helpers.dispatcher import async_dispatcher_connect
 
 from homeassistant.components.select import SelectEntity
 
 from .command import Command
-from .const import DOMAIN
+from .entity import DynamicEntity, with_write_policy
+from .bulk_add import async_setup_dynamic_entities
+from .const import DEFAULT_SELECT_OPTIONS
 
 _LOGGER = logging.getLogger(__name__)
 
-class DynamicSelect(SelectEntity):
+class DynamicSelect(DynamicEntity, SelectEntity):
     def __init__(
         self,
         entity_id: str,
@@ -23,13 +24,31 @@ class DynamicSelect(SelectEntity):
         self.entity_id = f"select.{entity_id}"
         self._attr_unique_id = f"select_{entity_id}"
         self._attr_name = name
-        self._attr_options = options or ["Option 1", "Option 2"]
+        self._attr_options = list(options or DEFAULT_SELECT_OPTIONS)
         self._attr_current_option = self._attr_options[0]
 
+    def _apply_command(self, command: Command) -> None:
+        # no selects: back to the defaults, as the stored record has them
+        self._attr_options = list(command.selects or DEFAULT_SELECT_OPTIONS)
+        if self._attr_current_option not in self._attr_options:
+            self._attr_current_option = self._attr_options[0]
+
+    def _stored_value(self) -> Optional[str]:
+        return self._attr_current_option
+
+    def _set_value(self, value: str) -> None:
+        if value not in self._attr_options:
+            raise ValueError(f"{self.entity_id}: {value!r} is not one of the options")
+        self._attr_current_option = value
+
+    def _restore_value(self, value: str) -> None:
+        if value in self._attr_options:
+            self._attr_current_option = value
+
     async def async_select_option(self, option: str) -> None:
         if option in self._attr_options:
             self._attr_current_option = option
-            self.async_write_ha_state()
+            self.async_write_value()
 
 
 async def async_setup_entry(
@@ -37,17 +56,11 @@ async def async_setup_entry(
     config_entry: ConfigEntry,
     async_add_entities: AddEntitiesCallback,
 ) -> None:
-
-    async def _handle_create(entity_type, entity_id, name, command):
-        if entity_type != "SELECT":
-            return
-
-        entity  = DynamicSelect(
-                entity_id,
-                name,
-                getattr(command, "selects", None)
-            )
-        async_add_entities([entity])          # ← just call, no await / no task
-        #hass.async_create_task(async_add_entities([entity]))
-
-    async_dispatcher_connect(hass, f"{DOMAIN}_create_entity", _handle_create)
\ No newline at end of file
+    async_setup_dynamic_entities(
+        hass, config_entry, async_add_entities, "SELECT",
+        lambda entity_id, name, command: with_write_policy(DynamicSelect(
+            entity_id,
+            name,
+            getattr(command, "selects", None)
+        ), command),
+    )
@@ -0,0 +1,95 @@
+import logging
+from datetime import timedelta
+from typing import Any, Callable
+
+from homeassistant.core import HomeAssistant
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import EntityCategory, UnitOfTime
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.components.sensor import SensorEntity, SensorStateClass
+
+from .const import DOMAIN
+from .metrics import STAGE_TOTAL, STAGES
+
+_LOGGER = logging.getLogger(__name__)
+
+# metrics are plain counters in memory, reading them is cheap
+SCAN_INTERVAL = timedelta(seconds=30)
+
+
+class CommandMetricSensor(SensorEntity):
+    """Diagnostic sensor reading one value from the processor's CommandMetrics."""
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_has_entity_name = True
+
+    def __init__(
+        self,
+        processor,
+        key: str,
+        name: str,
+        value_fn: Callable[[Any], Any],
+        attrs_fn: Callable[[Any], dict] | None = None,
+        unit: str | None = None,
+        state_class: SensorStateClass | None = SensorStateClass.MEASUREMENT,
+    ) -> None:
+        self._processor = processor
+        self._value_fn = value_fn
+        self._attrs_fn = attrs_fn
+        # a config entry with a prefix gets its own set: sensor.hs_command_listener_hs2_commands
+        object_id = f"{DOMAIN}_{processor.prefix}_{key}" if processor.prefix else f"{DOMAIN}_{key}"
+        self._attr_unique_id = object_id
+        self.entity_id = f"sensor.{object_id}"
+        self._attr_name = f"{name} {processor.prefix}" if processor.prefix else name
+        self._attr_native_unit_of_measurement = unit
+        self._attr_state_class = state_class
+
+    async def async_update(self) -> None:
+        self._attr_native_value = self._value_fn(self._processor)
+        if self._attrs_fn is not None:
+            self._attr_extra_state_attributes = self._attrs_fn(self._processor)
+
+
+async def async_setup_entry(
+    hass: HomeAssistant,
+    config_entry: ConfigEntry,
+    async_add_entities: AddEntitiesCallback,
+) -> None:
+    """Diagnostic sensors for command throughput, latency and errors."""
+    processor = hass.data[DOMAIN][config_entry.entry_id]
+
+    async_add_entities([
+        CommandMetricSensor(
+            processor, "commands", "Commands processed",
+            lambda p: p.metrics.commands,
+            lambda p: {
+                "events_delivered": p.events_delivered,
+                "events_processed": p.events_processed,
+                "entities": len(p.entities),
+                "store_writes": p.metrics.store_writes,
+            },
+            state_class=SensorStateClass.TOTAL_INCREASING,
+        ),
+        CommandMetricSensor(
+            processor, "command_rate", "Command rate",
+            lambda p: p.metrics.commands_per_second(),
+            unit="commands/s",
+        ),
+        CommandMetricSensor(
+            processor, "command_errors", "Command errors",
+            lambda p: sum(p.metrics.errors.values()),
+            lambda p: dict(p.metrics.errors),
+            state_class=SensorStateClass.TOTAL_INCREASING,
+        ),
+        CommandMetricSensor(
+            processor, "command_latency", "Command latency p95",
+            lambda p: p.metrics.percentiles(STAGE_TOTAL).get("p95"),
+            lambda p: {stage: p.metrics.percentiles(stage) for stage in STAGES},
+            unit=UnitOfTime.MILLISECONDS,
+        ),
+        CommandMetricSensor(
+            processor, "command_queue", "Command queue depth",
+            lambda p: p.queue.depth,
+            lambda p: {"max_depth": p.queue.max_depth},
+        ),
+    ], update_before_add=True)
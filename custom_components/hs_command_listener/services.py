@@ -0,0 +1,49 @@
+import logging
+
+import voluptuous as vol
+
+from homeassistant.core import HomeAssistant, ServiceCall, ServiceResponse, SupportsResponse
+from homeassistant.exceptions import HomeAssistantError
+import homeassistant.helpers.config_validation as cv
+
+from .const import CONF_PREFIX, DOMAIN, SERVICE_EXECUTE
+
+_LOGGER = logging.getLogger(__name__)
+
+# Service data is the command itself, e.g. {"command": "create", "type": "TOGGLE", "entityID": "x"}
+# or a batch {"command": "batch", "items": [...]}
+EXECUTE_SCHEMA = vol.Schema({vol.Required("command"): cv.string}, extra=vol.ALLOW_EXTRA)
+
+
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Register hs_command_listener.execute (once, shared by all config entries)."""
+    if hass.services.has_service(DOMAIN, SERVICE_EXECUTE):
+        return
+
+    async def _execute(call: ServiceCall) -> ServiceResponse:
+        data = dict(call.data)
+        # the config entry is picked by prefix, none is the entry without one
+        prefix = data.pop(CONF_PREFIX, "")
+        processor = next(
+            (p for p in hass.data.get(DOMAIN, {}).values() if p.prefix == prefix), None
+        )
+        if processor is None:
+            raise HomeAssistantError(f"HS Command Listener with prefix '{prefix}' is not loaded")
+
+        # through the queue, in order with the text entity and event commands
+        response = await processor.queue.async_submit(data)
+        if call.return_response:
+            return response
+        return None
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_EXECUTE,
+        _execute,
+        schema=EXECUTE_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+
+
+def async_unload_services(hass: HomeAssistant) -> None:
+    hass.services.async_remove(DOMAIN, SERVICE_EXECUTE)
@@ -1,15 +1,246 @@
-from homeassistant.helpers.storage import Store
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, Callable, List, Optional
+
+from homeassistant.core import callback
+from homeassistant.helpers.event import async_call_later
+from homeassistant.helpers.storage import STORAGE_DIR, Store
+
+from .command import load_json
+from .entity_table import EntityRecord, EntityTable
+from .const import DEFAULT_JOURNAL_FLUSH_DELAY, DEFAULT_SAVE_DELAY, DEFAULT_SAVE_MAX_DELAY
+from .metrics import CommandMetrics, STAGE_JOURNAL, STAGE_SAVE
+
+_LOGGER = logging.getLogger(__name__)
 
 STORAGE_VERSION = 1
 STORAGE_KEY = "hs_command_listener_entities.json"
+# last value of each dynamic entity, by unique_id
+VALUES_STORAGE_KEY = "hs_command_listener_values.json"
+# entity changes since the last snapshot (STORAGE_KEY), one JSON line each
+JOURNAL_KEY = "hs_command_listener_entities.journal"
+JOURNAL_ADD = "+"
+JOURNAL_REMOVE = "-"
+
+def shard_key(key: str, prefix: str) -> str:
+    """Storage key of a config entry; the entry without a prefix keeps the original."""
+    if not prefix:
+        return key
+    name, dot, ext = key.rpartition(".")
+    return f"{name}_{prefix}{dot}{ext}"
+
+
+def replay_journal(entities: EntityTable, entries: List[list]) -> None:
+    """Apply journal entries, oldest first, to the table loaded from the snapshot."""
+    for change in entries:
+        if change[0] == JOURNAL_ADD:
+            entities.add(EntityRecord.from_dict(change[1]))
+        else:
+            entities.remove(change[1], change[2])
+
 
 class EntityStore:
-    def __init__(self, hass):
-        self._store = Store(hass, STORAGE_VERSION, STORAGE_KEY)
+    def __init__(
+        self,
+        hass,
+        delay: float = DEFAULT_SAVE_DELAY,
+        max_delay: float = DEFAULT_SAVE_MAX_DELAY,
+        metrics: Optional[CommandMetrics] = None,
+        key: str = STORAGE_KEY,
+        default: Callable[[], Any] = list,
+    ):
+        self._store = Store(hass, STORAGE_VERSION, key)
+        self._default = default
+        self._metrics = metrics
+        self._delay = delay
+        self._max_delay = max_delay
+        self._data_func: Optional[Callable[[], Any]] = None
+        self._pending_since: Optional[float] = None
 
     async def async_load(self):
-        return await self._store.async_load() or []
+        return await self._store.async_load() or self._default()
 
 
     async def async_save(self, data):
+        """Write immediately, superseding any scheduled write."""
+        self._pending_since = None
         await self._store.async_save(data)
+
+
+    @callback
+    def async_delay_save(self, data_func: Callable[[], Any]) -> None:
+        """Schedule a coalesced write; `data_func` is called when the write happens.
+
+        Every call pushes the write back by `delay`, bounded by `max_delay` from
+        the first unsaved change. Store flushes pending writes on HA shutdown.
+        """
+        now = time.monotonic()
+        if self._pending_since is None:
+            self._pending_since = now
+        self._data_func = data_func
+        delay = min(self._delay, max(0, self._max_delay - (now - self._pending_since)))
+        self._store.async_delay_save(self._data_to_write, delay)
+
+
+    def _data_to_write(self) -> Any:
+        # runs in the event loop; the file itself is written in the executor
+        self._pending_since = None
+        if self._metrics is None:
+            return self._data_func()
+        self._metrics.store_writes += 1
+        with self._metrics.time(STAGE_SAVE):
+            return self._data_func()
+
+
+    async def async_write(self, data_func: Callable[[], Any]) -> None:
+        """Write now, superseding any scheduled write; counted like a delayed one."""
+        self._data_func = data_func
+        await self.async_save(self._data_to_write())
+
+
+    async def async_flush(self) -> None:
+        """Write a scheduled save now (unload)."""
+        if self._pending_since is not None:
+            await self.async_save(self._data_to_write())
+
+
+class EntityJournal:
+    """Append-only log of entity table changes, between two snapshots.
+
+    Appends are buffered and written with one fsync `delay` seconds after the
+    first unwritten one, so the cost of a change is one short line, not the
+    whole table. `async_compact` writes the snapshot through its EntityStore and
+    then deletes the journal. Entries are whole records or removals, so
+    replaying the journal over any later snapshot still gives the same table.
+    """
+
+    def __init__(
+        self,
+        hass,
+        key: str = JOURNAL_KEY,
+        delay: float = DEFAULT_JOURNAL_FLUSH_DELAY,
+        metrics: Optional[CommandMetrics] = None,
+    ) -> None:
+        self.hass = hass
+        self._path = hass.config.path(STORAGE_DIR, key)
+        self._delay = delay
+        self._metrics = metrics
+        self._lines: List[str] = []
+        # entries in the file since the last compaction
+        self._written = 0
+        self._lock = asyncio.Lock()
+        self._cancel_flush: Optional[Callable[[], None]] = None
+
+    @property
+    def entries(self) -> int:
+        return self._written + len(self._lines)
+
+    @property
+    def pending(self) -> bool:
+        return bool(self._lines)
+
+    def append_add(self, record: dict) -> None:
+        self._lines.append(json.dumps([JOURNAL_ADD, record], separators=(",", ":")))
+
+    def append_remove(self, etype: str, entity_id: str) -> None:
+        self._lines.append(json.dumps([JOURNAL_REMOVE, etype, entity_id], separators=(",", ":")))
+
+
+    async def async_load(self) -> List[list]:
+        """The entries written since the last compaction, oldest first."""
+        entries = await self.hass.async_add_executor_job(self._read)
+        self._written = len(entries)
+        return entries
+
+
+    @callback
+    def async_delay_flush(self) -> None:
+        """Write the buffered entries `delay` seconds from the first unwritten one."""
+        if self._cancel_flush is None and self._lines:
+            self._cancel_flush = async_call_later(self.hass, self._delay, self._scheduled_flush)
+
+
+    @callback
+    def _scheduled_flush(self, _now) -> None:
+        self._cancel_flush = None
+        self.hass.async_create_task(self.async_flush())
+
+
+    async def async_flush(self) -> None:
+        """Write and fsync the buffered entries now."""
+        if self._cancel_flush is not None:
+            self._cancel_flush()
+            self._cancel_flush = None
+        async with self._lock:
+            await self._async_write()
+
+
+    async def async_compact(self, store: EntityStore, data_func: Callable[[], Any]) -> None:
+        """Write the snapshot `data_func()` through `store`, then delete the journal."""
+        async with self._lock:
+            # in the file first: a crash before the snapshot is written loses nothing
+            await self._async_write()
+            await store.async_write(data_func)
+            # appended while the snapshot was written: in it, and still buffered
+            # for the new journal (replaying them again is harmless)
+            await self.hass.async_add_executor_job(self._remove)
+            self._written = 0
+
+
+    async def _async_write(self) -> None:
+        if not self._lines:
+            return
+        lines, self._lines = self._lines, []
+        start = time.perf_counter()
+        try:
+            await self.hass.async_add_executor_job(self._append, "\n".join(lines) + "\n")
+        except OSError as exc:
+            # kept for the next flush or compaction
+            self._lines[:0] = lines
+            _LOGGER.error("Writing %s failed: %s", self._path, exc)
+            return
+        self._written += len(lines)
+        if self._metrics is not None:
+            self._metrics.journal_writes += 1
+            self._metrics.record(STAGE_JOURNAL, time.perf_counter() - start)
+
+
+    def _append(self, text: str) -> None:
+        os.makedirs(os.path.dirname(self._path), exist_ok=True)
+        with open(self._path, "a", encoding="utf-8") as file:
+            file.write(text)
+            file.flush()
+            os.fsync(file.fileno())
+
+
+    def _read(self) -> List[list]:
+        try:
+            with open(self._path, "rb") as file:
+                lines = file.read().splitlines(keepends=True)
+        except FileNotFoundError:
+            return []
+        entries = []
+        valid = 0
+        for number, line in enumerate(lines, 1):
+            try:
+                if not line.endswith(b"\n"):
+                    raise ValueError("no line end")
+                entries.append(load_json(line.decode()))
+            except ValueError:
+                # a crash during an append leaves at most the last line torn; cut it
+                # off, the next append must start on a line of its own
+                _LOGGER.warning("%s: line %s is incomplete, replay stops there", self._path, number)
+                os.truncate(self._path, valid)
+                break
+            valid += len(line)
+        return entries
+
+
+    def _remove(self) -> None:
+        try:
+            os.remove(self._path)
+        except FileNotFoundError:
+            pass
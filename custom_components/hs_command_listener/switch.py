@@ -3,14 +3,15 @@ import logging
 from homeassistant.core import HomeAssistant
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from homeassistant.helpers.dispatcher import async_dispatcher_connect
 
 from homeassistant.components.switch import SwitchEntity
-from .const import DOMAIN
+from .bulk_add import async_setup_dynamic_entities
+from .entity import DynamicEntity, with_write_policy
+from .const import SWITCH_STATES
 
 _LOGGER = logging.getLogger(__name__)
 
-class DynamicToggle(SwitchEntity):
+class DynamicToggle(DynamicEntity, SwitchEntity):
     def __init__(self, entity_id, name):
         self.entity_id = f"switch.{entity_id}"
         self._attr_unique_id = f"toggle_{entity_id}"
@@ -22,13 +23,27 @@ class DynamicToggle(SwitchEntity):
     def is_on(self):
         return self._attr_is_on
 
+    def _stored_value(self):
+        return self._attr_is_on
+
+    def _set_value(self, value):
+        if isinstance(value, str) and value.lower() in SWITCH_STATES:
+            self._attr_is_on = SWITCH_STATES[value.lower()]
+        elif isinstance(value, (bool, int, float)):
+            self._attr_is_on = bool(value)
+        else:
+            raise ValueError(f"{self.entity_id}: expected on/off, got {value!r}")
+
+    def _restore_value(self, value):
+        self._attr_is_on = bool(value)
+
     async def async_turn_on(self, **kwargs):
         self._attr_is_on = True
-        self.async_write_ha_state()
+        self.async_write_value()
 
     async def async_turn_off(self, **kwargs):
         self._attr_is_on = False
-        self.async_write_ha_state()
+        self.async_write_value()
 
 
 async def async_setup_entry(
@@ -37,13 +52,7 @@ async def async_setup_entry(
     async_add_entities: AddEntitiesCallback
 ) -> None:
     """Listen for dispatcher signals and create switches."""
-
-    async def _handler(entity_type, entity_id, name, command):
-        if entity_type != "TOGGLE":
-            return
-        
-        entity = DynamicToggle(entity_id, name)
-        async_add_entities([entity])          # ← just call, no await / no task
-        #hass.async_create_task(async_add_entities([entity]))
-
-    async_dispatcher_connect(hass, f"{DOMAIN}_create_entity", _handler)
+    async_setup_dynamic_entities(
+        hass, config_entry, async_add_entities, "TOGGLE",
+        lambda entity_id, name, command: with_write_policy(DynamicToggle(entity_id, name), command),
+    )
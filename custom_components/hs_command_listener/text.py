@@ -1,14 +1,16 @@
 import logging
-from typing import Optional, List
+import re
+from typing import Optional
 from homeassistant.core import HomeAssistant
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from homeassistant.helpers.dispatcher import async_dispatcher_connect
 
 from homeassistant.components.text import TextEntity
 
 from .command import Command
-from .const import DOMAIN, ENTITY_ID_COMMAND
+from .entity import DynamicEntity, with_write_policy
+from .bulk_add import async_setup_dynamic_entities
+from .const import DOMAIN, ENTITY_ID_COMMAND, DEFAULT_TEXT_MAX
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -18,13 +20,13 @@ _LOGGER = logging.getLogger(__name__)
 
 class HSTextEntity(TextEntity):
 
-    def __init__(self):
-        self._attr_unique_id = ENTITY_ID_COMMAND
+    def __init__(self, object_id: str = ENTITY_ID_COMMAND, name: str = "HS Command Input"):
+        self._attr_unique_id = object_id
         self._attr_has_entity_name = True
-        self._attr_name = "HS Command Input"
+        self._attr_name = name
         self._attr_native_value = ""
-        self.entity_id = f"text.{ENTITY_ID_COMMAND}"
-        _LOGGER.debug("HSTextEntity created with id %s", ENTITY_ID_COMMAND)
+        self.entity_id = f"text.{object_id}"
+        _LOGGER.debug("HSTextEntity created with id %s", object_id)
 
     async def async_set_value(self, value: str):
         _LOGGER.debug("HSTextEntity set to '%s'", value)
@@ -36,7 +38,7 @@ class HSTextEntity(TextEntity):
 # 2. Dynamic TEXT entity created via dispatcher
 # ----------------------------------------------------------------------
 
-class DynamicText(TextEntity):
+class DynamicText(DynamicEntity, TextEntity):
     """TextEntity created and removed on demand."""
 
     def __init__(
@@ -44,20 +46,43 @@ class DynamicText(TextEntity):
         entity_id: str,
         name: str,
         min_chars: int = 0,
-        max_chars: int = 255,
+        max_chars: int = DEFAULT_TEXT_MAX,
         pattern: Optional[str] = None,
     ) -> None:
         self.entity_id = f"text.{entity_id}"
         self._attr_unique_id = f"text_{entity_id}"
         self._attr_name = name
         self._attr_native_value = ""
-        self._attr_min = min_chars
-        self._attr_max = max_chars
+        self._attr_native_min = 0 if min_chars is None else int(min_chars)
+        self._attr_native_max = DEFAULT_TEXT_MAX if max_chars is None else int(max_chars)
         self._attr_pattern = pattern  # shown as “Pattern” in the UI
 
+    def _apply_command(self, command: "Command") -> None:
+        # omitted fields go back to the defaults, as the stored record has them
+        self._attr_native_min = 0 if command.min is None else int(command.min)
+        self._attr_native_max = DEFAULT_TEXT_MAX if command.max is None else int(command.max)
+        self._attr_pattern = command.pattern
+
+    def _stored_value(self) -> Optional[str]:
+        return self._attr_native_value
+
+    def _set_value(self, value: str) -> None:
+        if not isinstance(value, str):
+            raise ValueError(f"{self.entity_id}: expected a string, got {value!r}")
+        if not self._attr_native_min <= len(value) <= self._attr_native_max:
+            raise ValueError(
+                f"{self.entity_id}: length {len(value)} is outside {self._attr_native_min}..{self._attr_native_max}"
+            )
+        if self._attr_pattern and not re.fullmatch(self._attr_pattern, value):
+            raise ValueError(f"{self.entity_id}: {value!r} does not match {self._attr_pattern}")
+        self._attr_native_value = value
+
+    def _restore_value(self, value: str) -> None:
+        self._attr_native_value = str(value)
+
     async def async_set_value(self, value: str) -> None:
         self._attr_native_value = value
-        self.async_write_ha_state()
+        self.async_write_value()
 
 
 # ----------------------------------------------------------------------
@@ -80,33 +105,24 @@ async def async_setup_entry(
 ) -> None:
     """Register the fixed command helper and listen for dynamic TEXT creation."""
 
-    # 3-A  add the static command-input helper
-    async_add_entities([HSTextEntity()])   #  ← no await / no create_task
-    #hass.async_create_task(async_add_entities([HSTextEntity()]))
+    # 3-A  add the static command-input helper (one per config entry)
+    processor = hass.data[DOMAIN][config_entry.entry_id]
+    if processor.prefix:
+        command_input = HSTextEntity(processor.command_object_id, f"HS Command Input {processor.prefix}")
+    else:
+        command_input = HSTextEntity()
+    async_add_entities([command_input])   #  ← no await / no create_task
 
     _LOGGER.debug("HSTextEntity created (command input)")
 
     # 3-B  dynamic creation via dispatcher
-    async def _handle_create(
-        entity_type: str,
-        entity_id: str,
-        name: str,
-        command: "Command",
-    ) -> None:
-        if entity_type != "TEXT":
-            return
-
-        entity = DynamicText(
+    async_setup_dynamic_entities(
+        hass, config_entry, async_add_entities, "TEXT",
+        lambda entity_id, name, command: with_write_policy(DynamicText(
             entity_id,
             name,
             getattr(command, "min", 0),
-            getattr(command, "max", 255),
+            getattr(command, "max", DEFAULT_TEXT_MAX),
             getattr(command, "pattern", None),
-        )
-
-        async_add_entities([entity])         # ← no await
-        #await async_add_entities([entity])
-        #hass.async_create_task(async_add_entities([entity]))
-        _LOGGER.debug("DynamicText created: %s", entity.entity_id)
-
-    async_dispatcher_connect(hass, f"{DOMAIN}_create_entity", _handle_create)
\ No newline at end of file
+        ), command),
+    )
@@ -0,0 +1,75 @@
+import pytest
+
+from custom_components.hs_command_listener.command import Command, CommandError, load_json
+from custom_components.hs_command_listener.metrics import ERROR_INVALID_COMMAND, ERROR_MISSING_TYPE
+
+
+def test_create_is_normalised():
+    cmd = Command.from_json('{"command": "CREATE", "type": "NUMBER", "entityID": " Living Room ", "min": 5, "step": 0.5}')
+    assert cmd.command == "create"
+    assert cmd.entityID == "living_room"
+    # no name: the entityID
+    assert cmd.name == "living_room"
+    assert (cmd.min, cmd.max, cmd.step) == (5, None, 0.5)
+
+
+def test_unknown_and_null_fields_are_dropped():
+    cmd = Command.from_dict({"command": "delete", "type": "TOGGLE", "entityID": "a", "min": 1, "extra": [1], "name": None})
+    assert cmd.min is None
+    assert cmd.name == "a"
+
+
+def test_pretty_printed_json():
+    assert Command.from_json('{\n  "command": "debug",\r\n  "type": "TOGGLE"\n}').type == "TOGGLE"
+    assert load_json('{"name": "two\nlines"}') == {"name": "twolines"}
+
+
+@pytest.mark.parametrize(
+    "data, message",
+    [
+        ({"command": "create", "type": "NUMBER", "entityID": "a", "min": "1"}, "field 'min' must be a number, got str"),
+        # true is an int, but not a number here
+        ({"command": "create", "type": "NUMBER", "entityID": "a", "max": True}, "field 'max' must be a number, got bool"),
+        ({"command": "create", "type": "TOGGLE", "entityID": "a", "force": 1}, "field 'force' must be a boolean"),
+        ({"command": "create", "type": "SELECT", "entityID": "a", "selects": ["x", 2]}, "field 'selects[1]' must be a string"),
+        ({"command": "create", "type": "SELECT", "entityID": "a", "selects": "x"}, "field 'selects' must be a list"),
+        ({"command": "create", "type": "NUMBER", "entityID": "a", "max_rate": 0}, "'max_rate' must be greater than 0"),
+        ({"command": "create", "type": "NUMBER", "entityID": "a", "deadband": -1}, "'deadband' must not be negative"),
+        ({"command": "set", "values": ["switch.a"]}, "field 'values' must be an object"),
+    ],
+)
+def test_invalid_field(data, message):
+    with pytest.raises(CommandError, match=message.replace("[", r"\[").replace("]", r"\]")) as info:
+        Command.from_dict(data)
+    assert info.value.kind == ERROR_INVALID_COMMAND
+
+
+@pytest.mark.parametrize(
+    "data, field",
+    [
+        ({"command": "create", "entityID": "a"}, "type"),
+        ({"command": "delete", "type": "TOGGLE", "entityID": None}, "entityID"),
+        ({"command": "set"}, "values"),
+    ],
+)
+def test_missing_required_field(data, field):
+    with pytest.raises(CommandError, match=f"missing required field '{field}'") as info:
+        Command.from_dict(data)
+    assert info.value.kind == ERROR_MISSING_TYPE
+
+
+@pytest.mark.parametrize("data", [[], "create", {"type": "TOGGLE"}, {"command": 1}])
+def test_not_a_command(data):
+    with pytest.raises(CommandError):
+        Command.from_dict(data)
+
+
+def test_unknown_command_keeps_every_known_field():
+    cmd = Command.from_dict({"command": "Enable", "type": "TOGGLE", "entityID": "A", "values": {}})
+    assert (cmd.command, cmd.entityID, cmd.values) == ("enable", "a", {})
+
+
+def test_command_is_frozen():
+    cmd = Command.from_dict({"command": "debug", "type": "TOGGLE"})
+    with pytest.raises(AttributeError):
+        cmd.type = "NUMBER"
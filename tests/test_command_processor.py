@@ -0,0 +1,190 @@
+"""CommandProcessor end to end on benchmarks/fake_hass.py (needs homeassistant for the entity classes)."""
+import asyncio
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+import fake_hass
+
+from custom_components.hs_command_listener.const import DOMAIN
+
+
+def toggle(entity_id: str, **extra) -> dict:
+    return {"command": "create", "type": "TOGGLE", "entityID": entity_id, **extra}
+
+
+async def setup(**kwargs):
+    fake_hass.FakeStore.reset()
+    hass, entry = await fake_hass.async_setup({"coalesce_window": 0, **kwargs})
+    return hass, hass.data[DOMAIN][entry.entry_id]
+
+
+async def add_entry(hass, prefix: str):
+    _, entry = await fake_hass.async_setup({"coalesce_window": 0}, f"entry_{prefix}", {"prefix": prefix}, hass)
+    return hass.data[DOMAIN][entry.entry_id]
+
+
+async def submit(hass, processor, payload) -> dict:
+    response = await processor.queue.async_submit(payload)
+    # entities are added by tasks of the fake platforms
+    await hass.async_block_till_done()
+    await asyncio.sleep(0.01)
+    await hass.async_block_till_done()
+    return response
+
+
+def entity_ids(hass, domain: str = "switch") -> list:
+    return sorted(state.entity_id for state in hass.states.async_all(domain))
+
+
+def test_entries_are_sharded_by_prefix():
+    async def scenario():
+        hass, first = await setup()
+        second = await add_entry(hass, "hs2")
+        assert (await submit(hass, first, toggle("a")))["success"]
+        assert (await submit(hass, second, toggle("a")))["success"]
+        assert entity_ids(hass) == ["switch.a", "switch.hs2_a"]
+        assert [record.entityID for record in first.entities] == ["a"]
+        assert [record.entityID for record in second.entities] == ["a"]
+        assert first.store is not second.store
+
+    asyncio.run(scenario())
+
+
+def test_create_in_another_entrys_namespace_is_refused():
+    async def scenario():
+        hass, first = await setup()
+        second = await add_entry(hass, "hs2")
+        response = await submit(hass, first, toggle("hs2_x"))
+        assert not response["success"]
+        assert "prefix 'hs2'" in response["error"]
+        # an entry with a longer prefix owns "hs2_a_x": hs2's "a_x" is refused too
+        await add_entry(hass, "hs2_a")
+        assert not (await submit(hass, second, toggle("a_x")))["success"]
+        assert (await submit(hass, second, toggle("x")))["success"]
+        assert entity_ids(hass) == ["switch.hs2_x"]
+
+    asyncio.run(scenario())
+
+
+def test_reconcile_reports_an_item_in_another_namespace():
+    async def scenario():
+        hass, first = await setup()
+        await add_entry(hass, "hs2")
+        await submit(hass, first, {"command": "batch", "items": [toggle("a"), toggle("old")]})
+        response = await submit(
+            hass, first, {"command": "reconcile", "items": [toggle("a"), toggle("hs2_x"), toggle("b")]}
+        )
+        assert not response["success"]
+        assert [error["index"] for error in response["results"]] == [1]
+        assert (response["added"], response["removed"]) == (1, 1)
+        # the rest is applied and dispatched as usual
+        assert entity_ids(hass) == ["switch.a", "switch.b"]
+        assert sorted(record.entityID for record in first.entities) == ["a", "b"]
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("bad", [1, "x", {"type": "TOGGLE"}])
+def test_reconcile_with_an_unkeyed_item_removes_nothing(bad):
+    async def scenario():
+        hass, processor = await setup()
+        await submit(hass, processor, {"command": "batch", "items": [toggle("a"), toggle("b")]})
+        response = await submit(hass, processor, {"command": "reconcile", "items": [bad, toggle("c")]})
+        assert not response["success"]
+        assert (response["added"], response["removed"]) == (1, 0)
+        assert entity_ids(hass) == ["switch.a", "switch.b", "switch.c"]
+
+    asyncio.run(scenario())
+
+
+def test_batch():
+    async def scenario():
+        hass, processor = await setup()
+        response = await submit(
+            hass, processor, {"command": "batch", "items": [toggle("a"), {"command": "create"}, toggle("b")]}
+        )
+        assert not response["success"]
+        assert [result["success"] for result in response["results"]] == [True, False, True]
+        assert entity_ids(hass) == ["switch.a", "switch.b"]
+        # a bare list is a batch too
+        assert (await submit(hass, processor, [{"command": "delete", "type": "TOGGLE", "entityID": "a"}]))["success"]
+        assert entity_ids(hass) == ["switch.b"]
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("items", [5, "x", {"a": 1}])
+def test_batch_without_an_items_list(items):
+    async def scenario():
+        hass, processor = await setup()
+        response = await submit(hass, processor, {"command": "batch", "items": items})
+        assert response == {"success": False, "error": "Batch requires the items list"}
+
+    asyncio.run(scenario())
+
+
+def test_create_is_idempotent_and_updates_in_place():
+    async def scenario():
+        hass, processor = await setup()
+        number = {"command": "create", "type": "NUMBER", "entityID": "n", "name": "N", "min": 0, "max": 10}
+        await submit(hass, processor, number)
+        live = processor.live["number_n"]
+        assert (await submit(hass, processor, number))["success"]
+        assert processor.live["number_n"] is live
+        # changed attributes are applied to the live entity, not by adding a new one
+        await submit(hass, processor, {**number, "name": "Renamed", "max": 50})
+        assert processor.live["number_n"] is live
+        state = hass.states.get("number.n")
+        assert (state.name, state.attributes["max"]) == ("Renamed", 50)
+        assert entity_ids(hass, "number") == ["number.n"]
+
+    asyncio.run(scenario())
+
+
+def test_set_values():
+    async def scenario():
+        hass, processor = await setup()
+        await submit(hass, processor, {"command": "batch", "items": [
+            toggle("t"),
+            {"command": "create", "type": "NUMBER", "entityID": "n", "min": 0, "max": 10},
+            {"command": "create", "type": "SELECT", "entityID": "s", "selects": ["a", "b"]},
+        ]})
+        response = await submit(hass, processor, {"command": "set", "values": {
+            "switch.t": "on", "number.n": 7, "select.s": "c", "switch.missing": True,
+        }})
+        assert (response["success"], response["updated"]) == (False, 2)
+        assert sorted(response["errors"]) == ["select.s", "switch.missing"]
+        assert [hass.states.get(entity_id).state for entity_id in ("switch.t", "number.n", "select.s")] == [
+            "on", "7", "a"
+        ]
+        assert processor.values == {"toggle_t": True, "number_n": 7}
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize(
+    "purge, kept",
+    [
+        ({}, []),
+        ({"type": "SELECT"}, ["switch.hs_1", "switch.hs_2", "switch.other"]),
+        ({"entityID": "hs_*"}, ["select.other", "switch.other"]),
+        ({"type": "TOGGLE", "entityID": "hs_*"}, ["select.hs_1", "select.other", "switch.other"]),
+    ],
+)
+def test_purge_filters(purge, kept):
+    async def scenario():
+        hass, processor = await setup()
+        items = [
+            {"command": "create", "type": etype, "entityID": entity_id, "selects": ["a"]}
+            for etype in ("TOGGLE", "SELECT")
+            for entity_id in ("hs_1", "hs_2", "other")
+            if (etype, entity_id) != ("SELECT", "hs_2")
+        ]
+        await submit(hass, processor, {"command": "batch", "items": items})
+        assert (await submit(hass, processor, {"command": "purge", **purge}))["success"]
+        assert sorted(entity_ids(hass, "switch") + entity_ids(hass, "select")) == kept
+        assert len(processor.entities) == len(kept)
+
+    asyncio.run(scenario())
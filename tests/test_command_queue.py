@@ -0,0 +1,199 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from custom_components.hs_command_listener.command_queue import UNLOADED, CommandQueue
+from custom_components.hs_command_listener.const import OVERFLOW_DROP_OLDEST, OVERFLOW_REJECT
+from custom_components.hs_command_listener.metrics import ERROR_QUEUE_OVERFLOW, CommandMetrics
+
+
+def entity_key(payload):
+    # like the processor: create/delete are coalesced per entity, anything else is not
+    if payload[0] in ("create", "delete"):
+        return payload[1], payload
+    return None, payload
+
+
+class Processor:
+    def __init__(self, delay: float = 0) -> None:
+        self.delay = delay
+        self.applied = []
+        self.groups = []
+
+    async def process(self, payload):
+        await asyncio.sleep(self.delay)
+        self.applied.append(payload)
+        return {"success": True, "payload": payload}
+
+    async def process_many(self, payloads):
+        await asyncio.sleep(self.delay)
+        self.groups.append(payloads)
+        self.applied.extend(payloads)
+        return [{"success": True, "payload": payload} for payload in payloads]
+
+
+def make_queue(hass, processor, **kwargs):
+    metrics = CommandMetrics()
+    queue = CommandQueue(
+        hass, processor.process, metrics, key_fn=entity_key, process_many=processor.process_many, **kwargs
+    )
+    queue.async_start()
+    return queue, metrics
+
+
+def test_commands_apply_in_order(make_hass):
+    async def scenario():
+        processor = Processor()
+        queue, _ = make_queue(make_hass(), processor, coalesce_window=0)
+        results = await asyncio.gather(*(queue.async_submit(("set", i)) for i in range(5)))
+        assert processor.applied == [("set", i) for i in range(5)]
+        assert [result["payload"] for result in results] == processor.applied
+        await queue.async_stop()
+
+    asyncio.run(scenario())
+
+
+def test_coalescing_keeps_the_last_command_per_key(make_hass):
+    async def scenario():
+        processor = Processor()
+        queue, metrics = make_queue(make_hass(), processor, coalesce_window=0.05)
+        payloads = [("create", "a", 1), ("create", "b", 1), ("delete", "a", 2), ("create", "a", 3), ("set", "x")]
+        futures = [asyncio.ensure_future(queue.async_submit(payload)) for payload in payloads]
+        results = await asyncio.gather(*futures)
+        # "a" takes the position of its last command, the set ends the group
+        assert processor.groups == [[("create", "b", 1), ("create", "a", 3)]]
+        assert processor.applied[-1] == ("set", "x")
+        # every replaced command is answered with the result of the one that replaced it
+        assert [result["payload"] for result in results[:4]] == [("create", "a", 3), ("create", "b", 1)] + [
+            ("create", "a", 3)
+        ] * 2
+        assert metrics.coalesced == 2
+        await queue.async_stop()
+
+    asyncio.run(scenario())
+
+
+def test_lone_command_does_not_wait_for_the_window(make_hass):
+    async def scenario():
+        hass = make_hass()
+        processor = Processor()
+        queue, _ = make_queue(hass, processor, coalesce_window=10)
+        started = hass.loop.time()
+        await queue.async_submit(("create", "a", 1))
+        assert hass.loop.time() - started < 1
+        assert processor.groups == [[("create", "a", 1)]]
+        await queue.async_stop()
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("window, groups", [(0.01, [["a"], ["b1"], ["b2"]]), (10, [["a"], ["b2"]])])
+def test_commands_queued_while_busy_coalesce_within_the_window(make_hass, window, groups):
+    async def scenario():
+        processor = Processor(delay=0.05)
+        queue, _ = make_queue(make_hass(), processor, coalesce_window=window)
+        futures = [asyncio.ensure_future(queue.async_submit(("create", "a", "a")))]
+        await asyncio.sleep(0)
+        # both wait while "a" is applied, queued 0.03 s apart
+        futures.append(asyncio.ensure_future(queue.async_submit(("create", "b", "b1"))))
+        await asyncio.sleep(0.03)
+        futures.append(asyncio.ensure_future(queue.async_submit(("create", "b", "b2"))))
+        await asyncio.gather(*futures)
+        assert [[payload[2] for payload in group] for group in processor.groups] == groups
+        await queue.async_stop()
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("overflow, kept", [(OVERFLOW_DROP_OLDEST, [1, 2]), (OVERFLOW_REJECT, [0, 1])])
+def test_overflow(make_hass, overflow, kept):
+    async def scenario():
+        processor = Processor()
+        queue, metrics = make_queue(make_hass(), processor, maxsize=2, overflow=overflow, coalesce_window=0)
+        futures = [asyncio.get_running_loop().create_future() for _ in range(3)]
+        accepted = [queue.async_put(("set", i), future) for i, future in enumerate(futures)]
+        assert accepted == [True, True, overflow != OVERFLOW_REJECT]
+        await asyncio.gather(*futures)
+        assert [payload[1] for payload in processor.applied] == kept
+        assert sum(not future.result()["success"] for future in futures) == 1
+        assert metrics.errors[ERROR_QUEUE_OVERFLOW] == 1
+        await queue.async_stop()
+
+    asyncio.run(scenario())
+
+
+def test_stop_drains_the_queue(make_hass):
+    async def scenario():
+        processor = Processor(delay=0.01)
+        queue, _ = make_queue(make_hass(), processor, coalesce_window=0.05)
+        payloads = [("set", 1), ("create", "a"), ("set", 2)]
+        futures = [asyncio.ensure_future(queue.async_submit(payload)) for payload in payloads]
+        await asyncio.sleep(0)
+        await queue.async_stop()
+        assert [result["success"] for result in await asyncio.gather(*futures)] == [True, True, True]
+        assert processor.applied == payloads
+        # refused once stopping
+        assert await queue.async_submit(("set", 3)) == UNLOADED
+        assert queue.depth == 0
+
+    asyncio.run(scenario())
+
+
+def test_start_after_stop_accepts_commands_again(make_hass):
+    async def scenario():
+        processor = Processor()
+        queue, _ = make_queue(make_hass(), processor, coalesce_window=0)
+        await queue.async_stop()
+        assert await queue.async_submit(("set", 1)) == UNLOADED
+        queue.async_start()
+        assert (await queue.async_submit(("set", 2)))["success"]
+        assert processor.applied == [("set", 2)]
+        await queue.async_stop()
+
+    asyncio.run(scenario())
+
+
+def test_stop_timeout_answers_the_rest(make_hass):
+    async def scenario():
+        processor = Processor(delay=10)
+        queue, _ = make_queue(make_hass(), processor, coalesce_window=0)
+        futures = [asyncio.ensure_future(queue.async_submit(("set", i))) for i in range(3)]
+        await asyncio.sleep(0)
+        await queue.async_stop(timeout=0.05)
+        # the command in flight is cancelled, the queued ones are dropped, all are answered
+        assert await asyncio.gather(*futures) == [UNLOADED] * 3
+        assert processor.applied == []
+
+    asyncio.run(scenario())
+
+
+def test_stop_timeout_answers_a_coalescing_group(make_hass):
+    async def scenario():
+        processor = Processor(delay=10)
+        queue, _ = make_queue(make_hass(), processor, coalesce_window=0.01)
+        futures = [asyncio.ensure_future(queue.async_submit(("create", key))) for key in "ab"]
+        await asyncio.sleep(0.05)
+        await queue.async_stop(timeout=0.05)
+        assert await asyncio.gather(*futures) == [UNLOADED] * 2
+
+    asyncio.run(scenario())
+
+
+def test_failing_command_keeps_the_consumer_alive(make_hass):
+    async def scenario():
+        processor = Processor()
+
+        async def process(payload):
+            if payload == "boom":
+                raise RuntimeError("boom")
+            return await processor.process(payload)
+
+        queue = CommandQueue(make_hass(), process, CommandMetrics())
+        queue.async_start()
+        assert await queue.async_submit("boom") == {"success": False, "error": "boom"}
+        assert (await queue.async_submit("ok"))["success"]
+        await queue.async_stop()
+
+    asyncio.run(scenario())
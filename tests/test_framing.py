@@ -0,0 +1,155 @@
+import base64
+import json
+import zlib
+
+import pytest
+
+from custom_components.hs_command_listener.command import CommandError
+from custom_components.hs_command_listener.framing import (
+    ENCODING_PLAIN,
+    ENCODING_ZLIB,
+    MAX_CHUNKS,
+    STATE_MAX_LENGTH,
+    ChunkAssembler,
+    encode_chunks,
+    is_chunk,
+)
+from custom_components.hs_command_listener.metrics import ERROR_CHUNK_OVERFLOW, ERROR_CHUNK_TIMEOUT, ERROR_INVALID_CHUNK
+
+MESSAGE = json.dumps(
+    {"command": "batch", "items": [{"command": "create", "type": "TOGGLE", "entityID": f"homeseer_{i}"} for i in range(40)]}
+)
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def assembler(**kwargs):
+    errors = []
+    clock = Clock()
+    chunks = ChunkAssembler(on_error=lambda kind, message: errors.append(kind), clock=clock, **kwargs)
+    return chunks, clock, errors
+
+
+def feed_all(chunks, frames):
+    results = [chunks.feed(frame) for frame in frames]
+    assert results[:-1] == [None] * (len(frames) - 1)
+    return results[-1]
+
+
+@pytest.mark.parametrize("encoding", [ENCODING_PLAIN, ENCODING_ZLIB])
+def test_round_trip(encoding):
+    frames = encode_chunks(MESSAGE, "sync-1", encoding)
+    assert len(frames) > 1
+    assert all(is_chunk(frame) and len(frame) <= STATE_MAX_LENGTH for frame in frames)
+    chunks, _, errors = assembler()
+    assert feed_all(chunks, frames) == MESSAGE
+    assert (chunks.pending, chunks.completed, errors) == (0, 1, [])
+
+
+def test_frames_in_any_order_and_repeated():
+    frames = encode_chunks(MESSAGE, "m")
+    chunks, _, _ = assembler()
+    # a repeated frame replaces the earlier copy instead of counting twice
+    assert feed_all(chunks, [frames[1], frames[1], *reversed(frames[2:]), frames[0]]) == MESSAGE
+    assert chunks.as_dict()["buffered_bytes"] == 0
+
+
+def test_interleaved_messages():
+    first, second = encode_chunks(MESSAGE, "a"), encode_chunks(MESSAGE[::-1], "b")
+    chunks, _, _ = assembler()
+    results = [chunks.feed(frame) for pair in zip(first, second) for frame in pair]
+    assert [result for result in results if result is not None] == [MESSAGE, MESSAGE[::-1]]
+
+
+def test_stale_message_is_dropped_on_next_frame():
+    chunks, clock, errors = assembler(timeout=10)
+    frames = encode_chunks(MESSAGE, "old")
+    chunks.feed(frames[0])
+    clock.now = 10.5
+    assert chunks.feed(encode_chunks("{}", "new")[0]) == "{}"
+    assert errors == [ERROR_CHUNK_TIMEOUT]
+    assert (chunks.pending, chunks.dropped) == (0, 1)
+    # the rest of the dropped message starts over and never completes alone
+    assert chunks.feed(frames[1]) is None
+
+
+def test_overflow_drops_oldest_incomplete_message():
+    # room for one message, not two
+    chunks, _, errors = assembler(max_bytes=len(MESSAGE) + 100)
+    first, second = encode_chunks(MESSAGE, "first"), encode_chunks(MESSAGE, "second")
+    for frame in first[:-1]:
+        chunks.feed(frame)
+    for frame in second[:-1]:
+        chunks.feed(frame)
+    assert errors == [ERROR_CHUNK_OVERFLOW]
+    assert chunks.pending == 1
+    assert chunks.feed(second[-1]) == MESSAGE
+    assert chunks.feed(first[-1]) is None
+
+
+def test_reused_id_replaces_unfinished_message():
+    chunks, _, errors = assembler()
+    chunks.feed(encode_chunks(MESSAGE, "m")[0])
+    assert chunks.feed(encode_chunks("{}", "m")[0]) == "{}"
+    assert errors == [ERROR_INVALID_CHUNK]
+
+
+def test_zlib_bomb_is_bounded():
+    frames = encode_chunks("[" + " " * 5_000_000 + "]", "bomb", ENCODING_ZLIB)
+    chunks, _, _ = assembler(max_bytes=100_000)
+    with pytest.raises(CommandError, match="larger than 100000 bytes") as info:
+        feed_all(chunks, frames)
+    assert info.value.kind == ERROR_INVALID_CHUNK
+
+
+def test_undecodable_message():
+    data = base64.b64encode(b"not zlib").decode()
+    chunks, _, _ = assembler()
+    with pytest.raises(CommandError, match="cannot be decoded"):
+        chunks.feed(f"#m:0:1:z:{data}")
+    with pytest.raises(CommandError, match="cannot be decoded"):
+        chunks.feed("#m:0:1:z:***")
+    zipped = base64.b64encode(zlib.compress(b"\xff\xfe")).decode()
+    with pytest.raises(CommandError, match="cannot be decoded"):
+        chunks.feed(f"#m:0:1:z:{zipped}")
+
+
+@pytest.mark.parametrize(
+    "frame, message",
+    [
+        ("#m:0:1", "Invalid chunk frame"),
+        ("#m:x:1::{}", "Invalid chunk frame"),
+        ("#bad id:0:1::{}", "Invalid chunk message id"),
+        (f"#{'a' * 17}:0:1::{{}}", "Invalid chunk message id"),
+        ("#m:1:1::{}", "out of range"),
+        ("#m:0:0::{}", "out of range"),
+        (f"#m:0:{MAX_CHUNKS + 1}::{{}}", "out of range"),
+        ("#m:0:1:gz:{}", "Unknown chunk encoding"),
+    ],
+)
+def test_malformed_frame(frame, message):
+    chunks, _, _ = assembler()
+    with pytest.raises(CommandError, match=message) as info:
+        chunks.feed(frame)
+    assert info.value.kind == ERROR_INVALID_CHUNK
+    assert chunks.pending == 0
+
+
+def test_data_may_contain_separators():
+    chunks, _, _ = assembler()
+    assert chunks.feed('#m:0:1::{"a": "b:c"}') == '{"a": "b:c"}'
+
+
+def test_encode_chunks_rejects():
+    with pytest.raises(ValueError, match="Invalid message id"):
+        encode_chunks("{}", "no spaces")
+    with pytest.raises(ValueError, match="Unknown encoding"):
+        encode_chunks("{}", "m", "gz")
+    with pytest.raises(ValueError, match="frames"):
+        encode_chunks("x" * 250 * (MAX_CHUNKS + 1), "m")
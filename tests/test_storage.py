@@ -0,0 +1,192 @@
+import asyncio
+import os
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from custom_components.hs_command_listener.entity_table import EntityRecord, EntityTable
+from custom_components.hs_command_listener.metrics import CommandMetrics
+from custom_components.hs_command_listener.storage import (
+    JOURNAL_ADD,
+    JOURNAL_REMOVE,
+    EntityJournal,
+    replay_journal,
+    shard_key,
+)
+
+LAMP = {"type": "TOGGLE", "entityID": "lamp", "name": "Lamp"}
+DIMMER = {"type": "NUMBER", "entityID": "dimmer", "name": "Dimmer", "min": 0, "max": 100}
+
+
+class SnapshotStore:
+    """Stands in for EntityStore; `during_write` runs while the snapshot is being written."""
+
+    def __init__(self, during_write=None) -> None:
+        self.snapshot = None
+        self.during_write = during_write
+
+    async def async_write(self, data_func) -> None:
+        data = data_func()
+        if self.during_write is not None:
+            await self.during_write()
+        await asyncio.sleep(0)
+        self.snapshot = data
+
+
+def read_file(journal: EntityJournal) -> bytes:
+    with open(journal._path, "rb") as file:
+        return file.read()
+
+
+def test_shard_key():
+    assert shard_key("hs_command_listener_entities.json", "") == "hs_command_listener_entities.json"
+    assert shard_key("hs_command_listener_entities.json", "hs2") == "hs_command_listener_entities_hs2.json"
+
+
+def test_flush_and_load(make_hass):
+    async def scenario():
+        hass = make_hass()
+        metrics = CommandMetrics()
+        journal = EntityJournal(hass, metrics=metrics)
+        journal.append_add(LAMP)
+        journal.append_remove("TOGGLE", "lamp")
+        assert (journal.entries, journal.pending) == (2, True)
+        await journal.async_flush()
+        assert (journal.entries, journal.pending, metrics.journal_writes) == (2, False, 1)
+        # nothing buffered, nothing written
+        await journal.async_flush()
+        assert metrics.journal_writes == 1
+
+        entries = await EntityJournal(hass).async_load()
+        assert entries == [[JOURNAL_ADD, LAMP], [JOURNAL_REMOVE, "TOGGLE", "lamp"]]
+
+    asyncio.run(scenario())
+
+
+def test_missing_journal_is_empty(make_hass):
+    async def scenario():
+        assert await EntityJournal(make_hass()).async_load() == []
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("torn", [b'["+",{"type":"TOG', b'["+",{"type":"TOGGLE"}]', b"\xff\xfe\n"])
+def test_torn_last_line_is_cut_off(make_hass, torn):
+    async def scenario():
+        hass = make_hass()
+        journal = EntityJournal(hass)
+        journal.append_add(LAMP)
+        await journal.async_flush()
+        intact = read_file(journal)
+        # a crash in the middle of the next append
+        with open(journal._path, "ab") as file:
+            file.write(torn)
+
+        reopened = EntityJournal(hass)
+        assert await reopened.async_load() == [[JOURNAL_ADD, LAMP]]
+        assert read_file(reopened) == intact
+        # the next append starts on a line of its own
+        reopened.append_add(DIMMER)
+        await reopened.async_flush()
+        assert await EntityJournal(hass).async_load() == [[JOURNAL_ADD, LAMP], [JOURNAL_ADD, DIMMER]]
+
+    asyncio.run(scenario())
+
+
+def test_replay_over_a_newer_snapshot():
+    # the journal's changes, then a crash after the snapshot was written but before
+    # the journal was deleted: the snapshot already has them all
+    entries = [
+        [JOURNAL_ADD, LAMP],
+        [JOURNAL_ADD, DIMMER],
+        [JOURNAL_ADD, {**LAMP, "name": "Desk Lamp"}],
+        [JOURNAL_REMOVE, "NUMBER", "dimmer"],
+    ]
+    table = EntityTable()
+    replay_journal(table, entries)
+    assert table.as_list() == [{**LAMP, "name": "Desk Lamp"}]
+
+    newer = EntityTable(table.as_list())
+    replay_journal(newer, entries)
+    assert newer.as_list() == table.as_list()
+    # so is a snapshot taken half way through the journal
+    halfway = EntityTable([LAMP, DIMMER])
+    replay_journal(halfway, entries)
+    assert halfway.as_list() == table.as_list()
+
+
+def test_replay_removal_of_a_missing_entity():
+    table = EntityTable([LAMP])
+    replay_journal(table, [[JOURNAL_REMOVE, "NUMBER", "dimmer"]])
+    assert table.get("TOGGLE", "lamp") == EntityRecord.from_dict(LAMP)
+
+
+def test_compaction_racing_with_appends(make_hass):
+    async def scenario():
+        hass = make_hass()
+        journal = EntityJournal(hass)
+        table = EntityTable()
+
+        def change_add(data):
+            table.add(EntityRecord.from_dict(data))
+            journal.append_add(data)
+
+        change_add(LAMP)
+        await journal.async_flush()
+
+        async def append_during_write():
+            # a change arrives while the snapshot is being written; the snapshot
+            # (taken already) misses it, flushes wait for the compaction
+            change_add(DIMMER)
+            flush = asyncio.ensure_future(journal.async_flush())
+            await asyncio.sleep(0)
+            assert not flush.done()
+            pending.append(flush)
+
+        pending = []
+        store = SnapshotStore(append_during_write)
+        await journal.async_compact(store, table.as_list)
+        await asyncio.gather(*pending)
+        assert store.snapshot == [LAMP]
+
+        # the late change survives in the new journal; replay gives the live table
+        replay = await EntityJournal(hass).async_load()
+        assert replay == [[JOURNAL_ADD, DIMMER]]
+        restored = EntityTable(store.snapshot)
+        replay_journal(restored, replay)
+        assert restored.as_list() == table.as_list()
+
+    asyncio.run(scenario())
+
+
+def test_compaction_deletes_the_journal(make_hass):
+    async def scenario():
+        hass = make_hass()
+        journal = EntityJournal(hass)
+        journal.append_add(LAMP)
+        store = SnapshotStore()
+        await journal.async_compact(store, lambda: [LAMP])
+        assert store.snapshot == [LAMP]
+        assert not os.path.exists(journal._path)
+        assert (journal.entries, journal.pending) == (0, False)
+
+    asyncio.run(scenario())
+
+
+def test_failed_write_keeps_the_entries(make_hass, tmp_path):
+    async def scenario():
+        hass = make_hass()
+        journal = EntityJournal(hass)
+        # the storage directory cannot be created
+        (tmp_path / ".storage").write_text("")
+        journal.append_add(LAMP)
+        await journal.async_flush()
+        assert (journal.entries, journal.pending) == (1, True)
+
+        (tmp_path / ".storage").unlink()
+        journal.append_add(DIMMER)
+        await journal.async_flush()
+        assert await EntityJournal(hass).async_load() == [[JOURNAL_ADD, LAMP], [JOURNAL_ADD, DIMMER]]
+
+    asyncio.run(scenario())